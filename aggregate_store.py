@@ -0,0 +1,149 @@
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import zlib
+from collections import Counter
+from speech_analysis import COUNTER_FIELDS, empty_counts, merge_counts, speech_rates, summarize_counts
+
+AGGREGATE_STORE_PATH = os.getenv("AGGREGATE_STORE_PATH", "aggregates.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    influencer TEXT,
+    duration REAL NOT NULL,
+    total_words INTEGER NOT NULL,
+    filler_words TEXT NOT NULL,
+    partials BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_influencer ON videos (influencer);
+"""
+
+# Fields of a video's counts kept as partials; the joined text and the
+# per-sentence scores stay in the analysis cache
+PARTIAL_FIELDS = ("total_words", "sentiment_totals") + COUNTER_FIELDS
+
+def video_partials(counts):
+    return {field: counts[field] for field in PARTIAL_FIELDS}
+
+def _load_partials(blob):
+    partials = empty_counts()
+    for field, value in json.loads(zlib.decompress(blob)).items():
+        partials[field] = Counter(value) if field in COUNTER_FIELDS else value
+    return partials
+
+class AggregateStore:
+    """Per-video partial aggregates (word, filler and n-gram counts, sentiment
+    totals, word totals, duration) that merge exactly into per-influencer and
+    corpus-wide metrics without re-parsing any transcript.
+
+    The leaderboard reads only the scalar columns and the small filler counts,
+    so it stays instant across hundreds of creators.
+    """
+
+    def __init__(self, path=AGGREGATE_STORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def __contains__(self, video_id):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone() is not None
+
+    def put(self, video_id, counts, duration, influencer=None):
+        """Stores (or replaces) the partials of one video's counts."""
+        self.put_many([(video_id, counts, duration, influencer)])
+
+    def put_many(self, videos):
+        """Stores (video_id, counts, duration, influencer) tuples in a single transaction."""
+        rows = [
+            (video_id, influencer, duration, counts["total_words"], json.dumps(counts["filler_words"]),
+             zlib.compress(json.dumps(video_partials(counts)).encode("utf-8")))
+            for video_id, counts, duration, influencer in videos
+        ]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def influencers(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT DISTINCT influencer FROM videos WHERE influencer IS NOT NULL ORDER BY influencer")]
+
+    def load(self, influencer=None, video_ids=None):
+        """Returns [(video_id, partials, duration)] in the order the videos were stored."""
+        query, params = "SELECT video_id, partials, duration FROM videos", []
+        if influencer is not None:
+            query, params = query + " WHERE influencer = ?", [influencer]
+        elif video_ids is not None:
+            params = list(video_ids)
+            query += f" WHERE video_id IN ({','.join('?' * len(params))})"
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY rowid", params).fetchall()
+        return [(video_id, _load_partials(blob), duration) for video_id, blob, duration in rows]
+
+    def rollup(self, influencer=None, video_ids=None, top_topics=10):
+        """Merged metrics of an influencer, a set of videos, or the whole corpus when neither is given."""
+        videos = self.load(influencer, video_ids)
+        duration = sum(duration for _, _, duration in videos)
+        summary = summarize_counts(merge_counts([partials for _, partials, _ in videos]), duration, top_topics=top_topics)
+        summary.update(videos=len(videos), duration=duration)
+        return summary
+
+    def leaderboard(self, sort_by="speaking_pace", descending=True):
+        """Pace and filler % per influencer, summed from the stored scalars."""
+        totals = {}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT influencer, duration, total_words, filler_words FROM videos WHERE influencer IS NOT NULL ORDER BY rowid"
+            ).fetchall()
+        for influencer, duration, total_words, filler_words in rows:
+            entry = totals.setdefault(influencer, {"videos": 0, "duration": 0.0, "total_words": 0, "filler_words": Counter()})
+            entry["videos"] += 1
+            entry["duration"] += duration
+            entry["total_words"] += total_words
+            entry["filler_words"].update(json.loads(filler_words))
+        board = []
+        for influencer, entry in totals.items():
+            filler_percentage, speaking_pace = speech_rates(entry["total_words"], entry["duration"], entry["filler_words"])
+            board.append({
+                "influencer": influencer, "videos": entry["videos"], "total_words": entry["total_words"],
+                "duration": round(entry["duration"], 2), "speaking_pace": speaking_pace, "filler_percentage": filler_percentage,
+            })
+        return sorted(board, key=lambda row: row[sort_by], reverse=descending)
+
+    def close(self):
+        self._db.close()
+
+def index_videos(video_data, store, fetch_transcript, **parse_options):
+    """Analyzes (or loads from the analysis cache) each video of app4-style video_data and stores its partials."""
+    from analysis_cache import analyze_video
+    stored = 0
+    for data in video_data:
+        match = re.search(r"(?:v=|\/|vi\/)([0-9A-Za-z_-]{11})", data["video_url"])
+        analyzed = analyze_video(match.group(1), fetch_transcript, **parse_options) if match else None
+        if analyzed:
+            counts, duration = analyzed
+            store.put(match.group(1), counts, duration, data.get("influencer_name"))
+            stored += 1
+    return stored
+
+if __name__ == "__main__":
+    # Index the videos of a sponsorship results CSV (influencer + URL) from the
+    # local transcript store, then print the influencer leaderboard
+    from transcript_store import TranscriptStore
+    results_csv = sys.argv[1] if len(sys.argv) > 1 else "sponsorship_analysis.csv"
+    with open(results_csv, newline="", encoding="utf-8") as file:
+        video_data = [{"video_url": row["Video URL"], "influencer_name": row["Influencer Name"]} for row in csv.DictReader(file)]
+    transcripts = TranscriptStore()
+    store = AggregateStore()
+    print(f"Stored partials for {index_videos(video_data, store, transcripts.get)} of {len(video_data)} videos in {store.path}")
+    for row in store.leaderboard():
+        print(f"{row['influencer']}: {row['speaking_pace']} wpm, {row['filler_percentage']}% fillers over {row['videos']} videos")
+    store.close()
+    transcripts.close()
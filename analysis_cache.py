@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+from instrumentation import span
+from model_registry import get_nlp, get_registry
+from speech_analysis import ALL_METRICS, ANALYSIS_VERSION, PARSE_VERSION, count_docs, needed_components, parse_entries
+from speech_timeline import windowed_metrics
+from utterances import segment_utterances
+
+CACHE_FOLDER = "analysis_cache"
+MAX_CACHE_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+def cache_key(video_id, metrics=ALL_METRICS):
+    """Builds the cache key from the video ID, spaCy model version and analysis version."""
+    signature = f"{get_registry().spacy_signature()}|{ANALYSIS_VERSION}|{','.join(sorted(metrics))}"
+    return f"{video_id}_{hashlib.sha1(signature.encode('utf-8')).hexdigest()[:12]}"
+
+def docs_key(video_id, metrics=ALL_METRICS):
+    """Builds the key of a video's parsed Docs from the spaCy model version, parse
+    version and pipeline components; unlike cache_key it survives analysis changes."""
+    signature = f"{get_registry().spacy_signature()}|{PARSE_VERSION}|{','.join(sorted(needed_components(metrics)))}"
+    return f"{video_id}_docs_{hashlib.sha1(signature.encode('utf-8')).hexdigest()[:12]}"
+
+def _counts_path(video_id, metrics):
+    return os.path.join(CACHE_FOLDER, f"{cache_key(video_id, metrics)}.json")
+
+def _docs_path(video_id, metrics):
+    return os.path.join(CACHE_FOLDER, f"{docs_key(video_id, metrics)}.spacy")
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+def is_cached(video_id, metrics=ALL_METRICS):
+    """Tells whether a video's analysis is in the cache without loading it."""
+    return os.path.exists(_counts_path(video_id, metrics))
+
+def load_video_analysis(video_id, metrics=ALL_METRICS):
+    """Returns the cached (counts, duration) for a video, or None on a miss."""
+    counts_path, docs_path = _counts_path(video_id, metrics), _docs_path(video_id, metrics)
+    if not os.path.exists(counts_path):
+        return None
+    # Touch both files so eviction drops the least recently used videos first; a concurrent
+    # eviction can remove them between the checks, which counts as a miss
+    try:
+        with open(counts_path, "r", encoding="utf-8") as file:
+            entry = json.load(file)
+        os.utime(counts_path)
+    except (OSError, ValueError):
+        return None
+    try:
+        os.utime(docs_path)
+    except OSError:
+        pass
+    return entry["counts"], entry["duration"]
+
+def load_video_docs(video_id, metrics=ALL_METRICS):
+    """Returns the cached parsed Docs for a video, or None on a miss."""
+    docs_path = _docs_path(video_id, metrics)
+    if not os.path.exists(docs_path):
+        return None
+    from spacy.tokens import DocBin
+    try:
+        with open(docs_path, "rb") as file:
+            data = file.read()
+        os.utime(docs_path)
+    except OSError:
+        return None
+    return list(DocBin().from_bytes(data).get_docs(get_nlp(needed_components(metrics)).vocab))
+
+def save_video_analysis(video_id, counts, duration, docs, metrics=ALL_METRICS):
+    """Stores the counts (and the serialized Docs, unless docs is None) of a video, then enforces the size limit."""
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    if docs is not None:
+        from spacy.tokens import DocBin
+        _write_atomic(_docs_path(video_id, metrics), DocBin(docs=docs).to_bytes())
+    counts_path = _counts_path(video_id, metrics)
+    entry = {"video_id": video_id, "duration": duration, "counts": counts}
+    _write_atomic(counts_path, json.dumps(entry).encode("utf-8"))
+    evict_cache()
+
+def evict_cache(max_bytes=MAX_CACHE_BYTES):
+    """Deletes least recently used cache files until the folder fits in max_bytes."""
+    if not os.path.isdir(CACHE_FOLDER):
+        return
+    entries = {}
+    for name in os.listdir(CACHE_FOLDER):
+        path = os.path.join(CACHE_FOLDER, name)
+        # Batch workers share the folder, so a file may vanish between listing and use
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if os.path.isfile(path):
+            # Files are grouped by key (a video's counts and its Docs are keyed apart, see docs_key)
+            key = os.path.splitext(name)[0]
+            used, size, paths = entries.get(key, (0, 0, []))
+            entries[key] = (max(used, stat.st_mtime), size + stat.st_size, paths + [path])
+    total = sum(size for _, size, _ in entries.values())
+    for _, size, paths in sorted(entries.values()):
+        if total <= max_bytes:
+            break
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+
+def analyze_video(video_id, fetch_transcript, metrics=ALL_METRICS, **parse_options):
+    """Returns (counts, duration) for a video, fetching and parsing it only on a cache miss.
+
+    fetch_transcript(video_id) must return the transcript entries
+    ({"text", "start", "duration"}). The counts include the video's
+    per-window timeline (see speech_timeline) as a list of rows and the raw
+    text of its timestamp-based utterances, which sentiment is scored on and
+    the Gemini review is chunked by.
+    """
+    with span("analyze_video", video_id=video_id) as timing:
+        with span("cache_lookup", video_id=video_id):
+            cached = load_video_analysis(video_id, metrics)
+        timing.set(cache="hit" if cached else "miss")
+        if cached:
+            return cached
+        # The fetch itself is timed by transcript_fetcher; this is the time the analysis waited for it
+        with span("transcript", video_id=video_id):
+            transcript = fetch_transcript(video_id)
+        if not transcript:
+            return None
+        timing.set(entries=len(transcript))
+        duration = transcript[-1]["start"] + transcript[-1].get("duration", 0)
+        # Docs cached by an earlier analysis version are reused, so only the counts are recomputed
+        with span("docs_lookup", video_id=video_id):
+            cached_docs = load_video_docs(video_id, metrics)
+        timing.set(docs="hit" if cached_docs is not None else "miss")
+        if cached_docs is None:
+            chunks, docs = parse_entries([entry["text"] for entry in transcript], metrics, **parse_options)
+        else:
+            chunks, docs = [doc.text for doc in cached_docs], cached_docs
+        with span("utterances", video_id=video_id):
+            utterances = [utterance["text"] for utterance in segment_utterances(transcript)]
+        counts = count_docs(chunks, docs, metrics, utterances)
+        counts["utterances"] = utterances
+        counts["timeline"] = windowed_metrics(transcript).tolist()
+        with span("cache_save", video_id=video_id):
+            save_video_analysis(video_id, counts, duration, docs if cached_docs is None else None, metrics)
+        return counts, duration
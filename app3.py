@@ -1,55 +1,33 @@
-import os
 import re
-import spacy
-import contractions
-from youtube_transcript_api import YouTubeTranscriptApi
 from dotenv import load_dotenv
-import google.generativeai as genai
-from concurrent.futures import ThreadPoolExecutor
+from transcript_fetcher import TranscriptFetcher
+from gemini_client import QuotaScheduler
+from model_registry import get_gemini
+from caption_cleaner import clean_lines
+from llm_map_reduce import map_reduce
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
-nlp = spacy.load("en_core_web_sm")
+gemini_scheduler = QuotaScheduler()
 
 def extract_video_id(url):
     """Extracts YouTube video ID from a given URL."""
     match = re.search(r"(?:v=|\/|vi\/)([0-9A-Za-z_-]{11})", url)
     return match.group(1) if match else None
 
-def get_youtube_transcript(video_url):
-    """Fetches YouTube transcript with timestamps."""
-    video_id = extract_video_id(video_url)
-    if not video_id:
-        return []
-    try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        return [entry['text'] for entry in transcript]
-    except Exception as e:
-        print(f"Error fetching transcript: {str(e)}")
-        return []
+def get_youtube_transcripts(video_urls):
+    """Fetches YouTube transcripts concurrently, returning the caption lines of each video."""
+    video_ids = [video_id for video_id in map(extract_video_id, video_urls) if video_id]
+    with TranscriptFetcher() as fetcher:
+        transcripts = fetcher.fetch_many(video_ids)
+    return [[entry['text'] for entry in transcripts[video_id]] for video_id in video_ids]
 
 def preprocess_text(transcript):
-    """Cleans the transcript and removes unnecessary characters."""
-    processed_transcript = []
-    
-    for text in transcript: 
-        processed_text = contractions.fix(text.lower())  
-        processed_text = re.sub(r'[\[\](){}]', '', processed_text) 
-        doc = nlp(processed_text)
-        words = [token.text for token in doc if not token.is_punct and not token.is_space]
-        cleaned_text = " ".join(words)
-        processed_transcript.append(cleaned_text) 
-
-    return processed_transcript
-
-
-
-def analyze_with_gemini(cleaned_transcript):
-    """Passes the cleaned transcript to Gemini for analysis."""
-    transcript_text = " ".join(cleaned_transcript)
+    """Cleans the transcript and removes unnecessary characters (all lines in one batch, see caption_cleaner)."""
+    return clean_lines(transcript)
 
-    prompt = f"""
+def build_analysis_prompt(transcript_text):
+    """Builds the word and filler analysis prompt for a transcript or a part of one."""
+    return f"""
 ## 📊 YouTube Transcript Analysis Report  
 You are a linguestic expert help me to find the required words in the transcript which i pass
 You are given a **cleaned transcript** from multiple YouTube videos.  
@@ -123,32 +101,56 @@ Your task is to dynamically analyze the text and generate insights **only from t
 Now, strictly analyze the transcript and generate the final report.
 """
 
-    model = genai.GenerativeModel("gemini-pro")
+def build_part_prompt(chunk, index, total):
+    """Analysis prompt for one part of a transcript that is too long for a single call."""
+    return f"This is part {index + 1} of {total} of the transcript.\n" + build_analysis_prompt(chunk)
+
+def build_merge_prompt(partial_reports):
+    """Merges the per-part reports into one report with the same sections."""
+    reports = "\n\n".join(f"### Part {index + 1} report:\n{report}" for index, report in enumerate(partial_reports))
+    return f"""
+You are given analysis reports for consecutive parts of the **same** transcript.
+Merge them into one final report with exactly the same sections and rules as the part reports.
+
+✔ **Add up the counts** of identical words and phrases across parts before ranking.  
+✔ **Only use words and phrases that appear in the part reports**—do not add new ones.  
+✔ Keep the same list lengths per section (top 10 meaningful words, top 20 non-filler words).  
+
+{reports}
+
+Now, generate the final merged report.
+"""
+
+def analyze_with_gemini(cleaned_transcript):
+    """Passes the cleaned transcript to Gemini for analysis, in concurrent parts when it is long."""
     try:
-        response = model.generate_content(prompt, generation_config={"temperature": 0.0, "top_p": 0.5, "top_k": 1})
-        return response.text
+        model = get_gemini("gemini-pro", "GOOGLE_API_KEY")
+        return map_reduce(
+            model, cleaned_transcript, build_part_prompt, build_merge_prompt, direct_prompt=build_analysis_prompt,
+            generation_config={"temperature": 0.0, "top_p": 0.5, "top_k": 1}, scheduler=gemini_scheduler,
+        )
     except Exception as e:
         return f"Error analyzing with Gemini: {str(e)}"
 
-video_urls = [
-    "https://youtu.be/2MkNdJXXdaQ?si=hKUxBSqyWbp6JXpQ",
-    "https://youtu.be/metQ-DtQISo?si=a_o2H1EwKBc3lc-Y",
-    "https://youtu.be/ghfITyxZcs4?si=E7cpYEoeokNVn5b1",
-    "https://youtu.be/3OvmwM61vJw?si=545tgrgVPD-J_ncy",
-    "https://youtu.be/un0SjUnHvvE?si=eCuVhgNepPs1FBdS"
-]
+if __name__ == "__main__":
+    video_urls = [
+        "https://youtu.be/2MkNdJXXdaQ?si=hKUxBSqyWbp6JXpQ",
+        "https://youtu.be/metQ-DtQISo?si=a_o2H1EwKBc3lc-Y",
+        "https://youtu.be/ghfITyxZcs4?si=E7cpYEoeokNVn5b1",
+        "https://youtu.be/3OvmwM61vJw?si=545tgrgVPD-J_ncy",
+        "https://youtu.be/un0SjUnHvvE?si=eCuVhgNepPs1FBdS"
+    ]
 
-with ThreadPoolExecutor() as executor:
-    transcripts = list(executor.map(get_youtube_transcript, video_urls))
+    transcripts = get_youtube_transcripts(video_urls)
 
-combined_transcript = [entry for sublist in transcripts for entry in sublist] if transcripts else []
+    combined_transcript = [entry for sublist in transcripts for entry in sublist] if transcripts else []
 
-if combined_transcript:
-    cleaned_transcript = preprocess_text(combined_transcript)
-    transcript_text = " ".join(cleaned_transcript)  
+    if combined_transcript:
+        cleaned_transcript = preprocess_text(combined_transcript)
+        transcript_text = " ".join(cleaned_transcript)  
 
-    gemini_analysis = analyze_with_gemini(cleaned_transcript)
-    print("\n📊 **Final Gemini Analysis:**")
-    print(gemini_analysis if gemini_analysis else "Gemini analysis returned no output.")
-else:
-    print("No valid transcripts found.")
\ No newline at end of file
+        gemini_analysis = analyze_with_gemini(cleaned_transcript)
+        print("\n📊 **Final Gemini Analysis:**")
+        print(gemini_analysis if gemini_analysis else "Gemini analysis returned no output.")
+    else:
+        print("No valid transcripts found.")
\ No newline at end of file
@@ -1,43 +1,85 @@
-import time
 import re
 import os
+import sys
 import csv
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv 
-import google.generativeai as genai
-from youtube_transcript_api import YouTubeTranscriptApi
+from gemini_client import GEMINI_CACHE, QuotaScheduler, generate
+from instrumentation import llm_summary, recorder, span, span_summary
+from model_registry import get_gemini
+from transcript_store import TranscriptStore
+from sponsor_localizer import localize_sponsor_segments, select_entries
+from sponsorship_jobs import CSV_HEADER, SponsorshipRun, csv_row
 
 load_dotenv()  
-api_key = os.getenv("GEMINI_API_KEY")
 
-if not api_key:
-    raise ValueError("❌ API key missing! Set GEMINI_API_KEY in environment variables.")
+CACHE_FOLDER = "transcripts"
+SPONSORSHIP_MODEL = "gemini-1.5-flash"
 
-genai.configure(api_key=api_key)  
+# Send only the windows a local pre-pass scores as likely ad reads (SPONSOR_LOCALIZER=0 sends everything)
+LOCALIZE_SPONSORS = os.getenv("SPONSOR_LOCALIZER", "1") != "0"
 
-CACHE_FOLDER = "transcripts"
-os.makedirs(CACHE_FOLDER, exist_ok=True)
+# The transcript fetcher and store and the Gemini scheduler are created on first
+# use and shared by every call, so importing helpers from here has no side effects
+_shared = {}
+_shared_lock = threading.Lock()
+
+def _get_shared(name, create):
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = create()
+        return _shared[name]
+
+def get_transcript_fetcher():
+    from transcript_fetcher import TranscriptFetcher
+    return _get_shared("fetcher", TranscriptFetcher)
+
+def _open_store():
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    return TranscriptStore()
+
+def get_transcript_store():
+    return _get_shared("store", _open_store)
+
+# Runs as many sponsorship calls at once as the Gemini quota allows
+def get_scheduler():
+    return _get_shared("scheduler", QuotaScheduler)
 
 def extract_video_id(url):
     match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11}).*", url)
     return match.group(1) if match else None
 
+def is_stored(video_id):
+    # Older runs cached transcripts as one JSON file per video; those are imported on demand
+    return video_id in get_transcript_store() or os.path.exists(os.path.join(CACHE_FOLDER, f"{video_id}.json"))
+
+def prefetch_transcripts(video_ids):
+    missing = [video_id for video_id in dict.fromkeys(video_ids) if video_id and not is_stored(video_id)]
+    if not missing:
+        return
+    print(f"🌐 Fetching {len(missing)} transcripts from YouTube API...")
+    fetched = get_transcript_fetcher().fetch_many(missing)
+    get_transcript_store().put_many({video_id: transcript for video_id, transcript in fetched.items() if transcript})
+
 def get_video_transcript(video_id):
-    cache_path = os.path.join(CACHE_FOLDER, f"{video_id}.json")
-    if os.path.exists(cache_path):
+    transcript = get_transcript_store().get(video_id)
+    if transcript is not None:
         print(f"📁 Using locally stored transcript for {video_id}")
-        with open(cache_path, "r", encoding="utf-8") as file:
-            return json.load(file)
-    try:
-        print(f"🌐 Fetching transcript for {video_id} from YouTube API...")
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        with open(cache_path, "w", encoding="utf-8") as file:
-            json.dump(transcript, file, indent=4)
-
         return transcript
-    except Exception as e:
-        print(f"❌ Error fetching transcript for {video_id}: {e}")
-        return []
+    json_path = os.path.join(CACHE_FOLDER, f"{video_id}.json")
+    if os.path.exists(json_path):
+        print(f"📁 Importing locally stored transcript for {video_id}")
+        with open(json_path, "r", encoding="utf-8") as file:
+            transcript = json.load(file)
+        get_transcript_store().put(video_id, transcript)
+        return transcript
+    print(f"🌐 Fetching transcript for {video_id} from YouTube API...")
+    transcript = get_transcript_fetcher().fetch(video_id)
+    if transcript:
+        get_transcript_store().put(video_id, transcript)
+    return transcript
 
 def format_time(seconds):
     try:
@@ -53,18 +95,26 @@ def convert_timestamp(timestamp):
         return timestamp 
     return format_time(timestamp)  
 
-def analyze_sponsorship(transcript, influencer_name, expected_product, video_url):
-    transcript_formatted = "\n".join(
-        f"[{format_time(entry['start'])}] {entry['text']}" for entry in transcript
-    )
+def format_transcript(entries):
+    return "\n".join(f"[{format_time(entry['start'])}] {entry['text']}" for entry in entries)
+
+# The Gemini prompt for one video; with localize, only the likeliest ad windows of the transcript are included
+def sponsorship_prompt(transcript, influencer_name, expected_product, video_url, localize=LOCALIZE_SPONSORS):
+    segments = localize_sponsor_segments(transcript, expected_product) if localize else []
+    if segments:
+        transcript_label = "Transcript excerpts most likely to contain the ad (with timestamps)"
+        transcript_formatted = "\n[...]\n".join(format_transcript(select_entries(transcript, [segment])) for segment in segments)
+    else:
+        transcript_label = "Transcript (with timestamps)"
+        transcript_formatted = format_transcript(transcript)
 
-    prompt = f"""
+    return f"""
 You are an AI expert in advertisement analysis. Analyze the transcript of an influencer's video to extract ad details and evaluate the ad's quality.
 
 ### **Video Details:**  
 - **Influencer Name:** {influencer_name}  
 - **Video URL:** {video_url}
-- **Transcript (with timestamps):**  
+- **{transcript_label}:**  
 {transcript_formatted}  
 
 ### **Instructions:**  
@@ -116,11 +166,19 @@ If **no advertisement** is found, return:
 Ensure the response is in **valid JSON format**.
 """
 
+def parse_sponsorship_response(text):
+    return json.loads(text.strip().strip("```json").strip("```").strip())
+
+def analyze_sponsorship(transcript, influencer_name, expected_product, video_url, localize=LOCALIZE_SPONSORS,
+                        use_cache=GEMINI_CACHE):
+    with span("sponsorship_prompt", video_url=video_url, entries=len(transcript)) as timing:
+        prompt = sponsorship_prompt(transcript, influencer_name, expected_product, video_url, localize)
+        timing.set(prompt_chars=len(prompt))
     try:
-        time.sleep(4) 
-        response = genai.GenerativeModel("gemini-1.5-flash").generate_content(prompt, generation_config={"temperature": 0} )
-        clean_text = response.text.strip().strip("```json").strip("```").strip()
-        sponsorship_data = json.loads(clean_text)
+        # Responses that are not valid JSON are kept out of the response cache, so a retry asks again
+        response = generate(get_gemini(SPONSORSHIP_MODEL), prompt, generation_config={"temperature": 0},
+                            scheduler=get_scheduler(), use_cache=use_cache, validate=parse_sponsorship_response)
+        sponsorship_data = parse_sponsorship_response(response.text)
 
         if sponsorship_data.get("advertisement_text") == "No Advertisement Found":
             return None
@@ -130,56 +188,76 @@ Ensure the response is in **valid JSON format**.
         return sponsorship_data
     except json.JSONDecodeError as e:
         print(f"⚠️ JSON Error: {e} - LLM Response: {response.text}")
-        return None
+        raise
     except Exception as e:
         print(f"LLM Error: {e}")
-        return None
-
-def process_videos(video_data):
-    results = []
-    for index, data in enumerate(video_data):
-        url = data["video_url"]
-        influencer_name = data["influencer_name"]
-        expected_product = data["expected_product"]
-
-        video_id = extract_video_id(url)
-        if not video_id:
-            print(f"Invalid URL: {url}")
-            continue
+        raise
 
-        transcript = get_video_transcript(video_id)
-        if not transcript:
-            print(f"No transcript available for: {url}")
+def sponsorship_result_path(video_id):
+    return os.path.join(CACHE_FOLDER, f"{video_id}_sponsorship.json")
+
+def import_existing_results(video_data, run):
+    # Per-video results from earlier runs count as done when resuming
+    for data in video_data:
+        video_id = extract_video_id(data["video_url"])
+        if run.is_complete(data["video_url"]) or not video_id or not os.path.exists(sponsorship_result_path(video_id)):
             continue
+        with open(sponsorship_result_path(video_id), "r", encoding="utf-8") as file:
+            run.record(data["video_url"], "done", json.load(file))
+
+def process_video(data, run):
+    url = data["video_url"]
+    influencer_name = data["influencer_name"]
+    expected_product = data["expected_product"]
 
-        sponsorship_section = analyze_sponsorship(transcript, influencer_name, expected_product, url)
-        if sponsorship_section:
-            results.append(sponsorship_section)
+    video_id = extract_video_id(url)
+    if not video_id:
+        print(f"Invalid URL: {url}")
+        run.record(url, "invalid_url")
+        return
 
-        print(f"Processed {url}")
+    with span("transcript", video_id=video_id):
+        transcript = get_video_transcript(video_id)
+    if not transcript:
+        print(f"No transcript available for: {url}")
+        run.record(url, "failed", error="no transcript")
+        return
 
-        if index < len(video_data) - 1:
-            wait_time = 5 
-            print(f"Waiting {wait_time} seconds before next request...")
-            time.sleep(wait_time)
+    # A video that failed in an earlier run asks the model again instead of replaying its cached answer
+    retry = run.status(url) == "failed"
+    try:
+        sponsorship_section = analyze_sponsorship(transcript, influencer_name, expected_product, url,
+                                                  use_cache=GEMINI_CACHE and not retry)
+    except Exception as e:
+        run.record(url, "failed", error=str(e))
+        return
+    if sponsorship_section:
+        with open(sponsorship_result_path(video_id), "w", encoding="utf-8") as file:
+            json.dump(sponsorship_section, file, indent=4)
+        run.record(url, "done", sponsorship_section)
+    else:
+        run.record(url, "no_ad")
+    print(f"Processed {url}")
 
-    return results
+def process_videos(video_data, run):
+    pending = [data for data in video_data if not run.is_complete(data["video_url"])]
+    print(f"{len(video_data) - len(pending)} videos already complete, {len(pending)} to process")
+    prefetch_transcripts(extract_video_id(data["video_url"]) for data in pending)
+    # Pacing is left to the scheduler, which keeps calls within the RPM/TPM quota
+    with ThreadPoolExecutor(max_workers=get_scheduler().max_concurrency) as executor:
+        list(executor.map(lambda data: process_video(data, run), pending))
+    order = {data["video_url"]: index for index, data in enumerate(video_data)}
+    return sorted(run.results(), key=lambda result: order.get(result["video_url"], len(order)))
 
 def save_results_to_csv(results, filename="sponsorship_analysis.csv"):
-    with open(filename, mode='w', newline='', encoding='utf-8') as file:
+    # Rewrite atomically so the incrementally appended CSV is never left half-written
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, mode='w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
-        writer.writerow([
-            "Influencer Name", "Video URL", "Advertisement Text", "Product", 
-            "Start Time", "End Time", "Expected Product", "Match", "Inference", 
-            "Ad Naturalness", "Persuasiveness", "Trustworthiness", "Ad Length & Placement", "Engagement", "Ad Classification"
-        ])
+        writer.writerow(CSV_HEADER)
         for entry in results:
-            writer.writerow([
-                entry['influencer_name'], entry['video_url'], entry['advertisement_text'], entry['product_name'],
-                entry['start_time'], entry['end_time'], entry['expected_product'], entry['match_accuracy'], entry['inference'],
-                entry['ad_naturalness'], entry['persuasiveness'], entry['trustworthiness'], 
-                entry['ad_length_placement'], entry['engagement'], entry['ad_classification']
-            ])
+            writer.writerow(csv_row(entry))
+    os.replace(tmp_filename, filename)
     print(f"Results saved to {filename}")
 video_data = [
     {"video_url": "https://www.youtube.com/watch?v=qWMK16uYQbU", "influencer_name": "Ali Abdaal", "expected_product": "trading 212"},
@@ -208,6 +286,19 @@ video_data = [
     {"video_url": "https://www.youtube.com/watch?v=yeWH2hxsB8Y", "influencer_name": "Bethany Mota", "expected_product": " CVS Pharmacy"},
     {"video_url": "https://www.youtube.com/watch?v=CVLEXwppll8", "influencer_name": "Bethany Mota", "expected_product": "Thredup"},
 ]
-results = process_videos(video_data)
-save_results_to_csv(results)
-print("✅ Sponsorship extraction completed.")
+if __name__ == "__main__":
+    # Fail before any video is processed when the API key is missing
+    get_gemini(SPONSORSHIP_MODEL)
+    # `python app4.py --resume` keeps the previous run's checkpoints and only processes unfinished videos
+    resume = "--resume" in sys.argv
+    run = SponsorshipRun(resume=resume)
+    if resume:
+        import_existing_results(video_data, run)
+    results = process_videos(video_data, run)
+    save_results_to_csv(results)
+    print(f"Run summary: {run.summary()}")
+    if recorder.enabled:
+        for stage in span_summary(recorder.records()):
+            print(f"⏱️ {stage['stage']}: {stage['calls']} calls, {stage['total_seconds']:.2f} s total, {stage['max_seconds']:.2f} s max")
+        print(f"⏱️ Gemini: {llm_summary(recorder.records())}")
+    print("✅ Sponsorship extraction completed.")
@@ -0,0 +1,145 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+# Whisper and pyannote both take 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Length of the frames stream_frames yields
+FRAME_SECONDS = float(os.getenv("AUDIO_FRAME_SECONDS", "30"))
+
+# Bytes written to ffmpeg's stdin at a time when the recording is in memory (an upload)
+FEED_BYTES = 1 << 20
+
+def _ffmpeg_command(path, start, duration, sample_rate):
+    command = ["ffmpeg", "-nostdin", "-v", "error"]
+    if start:
+        command += ["-ss", str(start)]
+    command += ["-i", path]
+    if duration is not None:
+        command += ["-t", str(duration)]
+    return command + ["-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"]
+
+def _feed(stdin, source):
+    # Writes an in-memory recording (bytes or a binary file object) to ffmpeg
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source)
+            for offset in range(0, len(view), FEED_BYTES):
+                stdin.write(view[offset:offset + FEED_BYTES])
+        else:
+            for block in iter(lambda: source.read(FEED_BYTES), b""):
+                stdin.write(block)
+    except BrokenPipeError:
+        pass  # ffmpeg stopped reading: it failed, or the caller stopped early
+    finally:
+        stdin.close()
+
+def _read_full(stream, buffer):
+    # Fills buffer from a pipe; returns the bytes read, less than len(buffer) only at end of stream
+    view, filled = memoryview(buffer), 0
+    while filled < len(buffer):
+        read = stream.readinto(view[filled:])
+        if not read:
+            break
+        filled += read
+    return filled
+
+def stream_frames(source, frame_seconds=FRAME_SECONDS, sample_rate=SAMPLE_RATE, start=0.0, duration=None):
+    """Yields mono float32 frames of frame_seconds (the last one may be shorter) as ffmpeg decodes them.
+
+    source is a file path, or the recording itself as bytes or a binary file
+    object (an upload), which is piped to ffmpeg's stdin. Nothing is written
+    to disk; one frame-sized buffer is reused for the whole stream.
+    """
+    piped = not isinstance(source, (str, os.PathLike))
+    process = subprocess.Popen(
+        _ffmpeg_command("pipe:0" if piped else os.fspath(source), start, duration, sample_rate),
+        stdin=subprocess.PIPE if piped else subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    if piped:
+        threading.Thread(target=_feed, args=(process.stdin, source), daemon=True).start()
+    buffer = bytearray(int(frame_seconds * sample_rate) * 2)
+    finished = False
+    try:
+        while not finished:
+            filled = _read_full(process.stdout, buffer)
+            finished = filled < len(buffer)
+            if filled:
+                yield np.frombuffer(buffer, dtype=np.int16, count=filled // 2).astype(np.float32) / 32768.0
+    finally:
+        if not finished:
+            process.kill()
+        process.stdout.close()
+        error = process.stderr.read().decode("utf-8", "replace").strip()
+        process.stderr.close()
+        if process.wait() and finished:
+            raise RuntimeError(f"ffmpeg could not decode the audio: {error}")
+
+def load_audio(source, sample_rate=SAMPLE_RATE, start=0.0, duration=None):
+    """The whole recording (or [start, start + duration)) as one mono float32 array."""
+    frames = list(stream_frames(source, FRAME_SECONDS, sample_rate, start, duration))
+    return np.concatenate(frames) if frames else np.zeros(0, dtype=np.float32)
+
+class SharedAudio:
+    """A decoded recording in shared memory, so worker processes read it without copying or temp files.
+
+    handle is picklable; workers pass it to read_shared. The process that
+    created it must call close() (or use it as a context manager) to free it.
+    """
+
+    def __init__(self, samples, sample_rate=SAMPLE_RATE):
+        samples = np.asarray(samples, dtype=np.float32)
+        self._memory = shared_memory.SharedMemory(create=True, size=max(samples.nbytes, 1))
+        np.ndarray(samples.shape, dtype=np.float32, buffer=self._memory.buf)[:] = samples
+        self.handle = (self._memory.name, len(samples), sample_rate)
+
+    @classmethod
+    def decode(cls, source, sample_rate=SAMPLE_RATE):
+        return cls(load_audio(source, sample_rate), sample_rate)
+
+    @property
+    def duration(self):
+        _, length, sample_rate = self.handle
+        return length / sample_rate
+
+    def close(self):
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_shared(handle, start=0, stop=None):
+    """Copy of samples[start:stop] of a SharedAudio, from any process."""
+    name, length, _ = handle
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        samples = np.ndarray((length,), dtype=np.float32, buffer=memory.buf)
+        chunk = samples[start:stop].copy()
+        del samples
+    finally:
+        memory.close()
+    return chunk
+
+def check_ingest(path):
+    """Decodes a recording by streaming and as one buffer, and checks they agree."""
+    started = time.perf_counter()
+    frames = sum(len(frame) for frame in stream_frames(path))
+    stream_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    with SharedAudio.decode(path) as audio:
+        shared_seconds = time.perf_counter() - started
+        print(f"{path}: {audio.duration:.1f} s of audio; streamed in {stream_seconds:.2f} s, "
+              f"to shared memory in {shared_seconds:.2f} s")
+        return frames == audio.handle[1]
+
+if __name__ == "__main__":
+    sys.exit(0 if all(check_ingest(path) for path in sys.argv[1:]) else 1)
@@ -0,0 +1,262 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait
+from analysis_cache import analyze_video
+from model_registry import get_gemini, get_nlp
+from speech_analysis import ALL_METRICS, needed_components, summarize_counts
+from sponsorship_jobs import SponsorshipRun, _append, _read_jsonl, _terminate_last_line
+
+# Videos whose transcripts are fetched together before being handed to the workers
+PREFETCH_BATCH = int(os.getenv("BATCH_PREFETCH", "200"))
+
+# Parquet results reach the file as a row group every PARQUET_ROW_GROUP videos,
+# or PARQUET_FLUSH_SECONDS after the oldest buffered one finished, whichever comes first
+PARQUET_ROW_GROUP = int(os.getenv("BATCH_PARQUET_ROW_GROUP", "50"))
+PARQUET_FLUSH_SECONDS = float(os.getenv("BATCH_PARQUET_FLUSH_SECONDS", "30"))
+
+# Parquet columns: text (nested values as JSON strings) and numbers. The schema
+# is fixed up front, so a column that is empty in the first row group (no
+# failures yet, or only failures) does not end up typed as null
+PARQUET_STRING_COLUMNS = ("video_url", "video_id", "influencer_name", "expected_product", "status", "error",
+                          "filler_words", "two_word_fillers", "three_word_fillers", "multi_word_fillers",
+                          "most_used_words", "sentiment_totals", "focused_topics")
+PARQUET_FLOAT_COLUMNS = ("duration", "total_words", "unique_words", "filler_percentage", "speaking_pace")
+
+# CSV headers accepted for each input column (app4 style and sponsorship_analysis.csv style)
+INPUT_COLUMNS = {
+    "video_url": ("video_url", "Video URL", "url"),
+    "influencer_name": ("influencer_name", "Influencer Name", "influencer"),
+    "expected_product": ("expected_product", "Expected Product", "product"),
+}
+
+# Summary fields left out of the per-video records: the full text and the per-sentence scores
+OMITTED_FIELDS = ("text", "sentiment_scores")
+
+def extract_video_id(url):
+    match = re.search(r"(?:v=|\/|vi\/)([0-9A-Za-z_-]{11})", url)
+    return match.group(1) if match else None
+
+def read_videos(paths):
+    """Reads videos from CSV files (influencer and expected-product columns optional)
+    or plain lists with one URL per line; blank lines and # comments are skipped."""
+    videos = []
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as file:
+            if path.endswith(".csv"):
+                for row in csv.DictReader(file):
+                    video = {field: next((row[name] for name in names if row.get(name)), "")
+                             for field, names in INPUT_COLUMNS.items()}
+                    if video["video_url"]:
+                        videos.append(video)
+            else:
+                videos.extend({"video_url": line.strip(), "influencer_name": "", "expected_product": ""}
+                              for line in file if line.strip() and not line.startswith("#"))
+    # The same video listed twice is analyzed once
+    return list({video["video_url"]: video for video in videos}.values())
+
+class JsonlWriter:
+    """Appends one JSON record per line as soon as each video finishes."""
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        _terminate_last_line(path)
+
+    def done_urls(self):
+        return {record["video_url"] for record in _read_jsonl(self.path) if record.get("status") == "done"}
+
+    def write(self, record):
+        _append(self.path, json.dumps(record) + "\n")
+
+    def close(self):
+        pass
+
+class ParquetWriter:
+    """Writes the records to Parquet one row group at a time (needs pyarrow).
+
+    Nested values (ranked word lists, sentiment totals) are stored as JSON
+    strings and every column has a fixed type, so all row groups share one
+    schema. Fields outside the schema are dropped.
+    """
+
+    def __init__(self, path, row_group_size=PARQUET_ROW_GROUP, flush_seconds=PARQUET_FLUSH_SECONDS):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            sys.exit("❌ Parquet output needs pyarrow: pip install pyarrow")
+        self._pa = pyarrow
+        self._parquet = pyarrow.parquet
+        self.path = path
+        self.row_group_size = row_group_size
+        self.flush_seconds = flush_seconds
+        self.schema = pyarrow.schema([(column, pyarrow.string()) for column in PARQUET_STRING_COLUMNS]
+                                     + [(column, pyarrow.float64()) for column in PARQUET_FLOAT_COLUMNS])
+        self._rows = []
+        self._oldest = None
+        self._writer = None
+
+    def done_urls(self):
+        return set()
+
+    def write(self, record):
+        self._rows.append({key: json.dumps(value) if isinstance(value, (list, dict)) else value
+                           for key, value in record.items()})
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if len(self._rows) >= self.row_group_size or time.monotonic() - self._oldest >= self.flush_seconds:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        if self._writer is None:
+            self._writer = self._parquet.ParquetWriter(self.path, self.schema)
+        self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self.schema))
+        self._rows = []
+        self._oldest = None
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+def open_writer(path, resume=False):
+    if path.endswith(".parquet"):
+        if resume:
+            sys.exit("❌ --resume needs JSONL output")
+        return ParquetWriter(path)
+    return JsonlWriter(path, resume)
+
+# Per-worker state: each worker process loads its own spaCy pipeline and opens its own transcript store
+_worker_store = None
+
+def _init_worker(metrics):
+    global _worker_store
+    from transcript_store import TranscriptStore
+    _worker_store = TranscriptStore()
+    get_nlp(needed_components(metrics))
+
+def analyze_record(video, metrics=ALL_METRICS):
+    """Runs in a worker: the speech metrics of one video as a flat, JSON-serializable record."""
+    video_id = extract_video_id(video["video_url"])
+    record = {**video, "video_id": video_id}
+    analyzed = analyze_video(video_id, _worker_store.get, metrics)
+    if not analyzed:
+        return {**record, "status": "no_transcript"}
+    counts, duration = analyzed
+    summary = summarize_counts(counts, duration, metrics)
+    for field in OMITTED_FIELDS:
+        summary.pop(field, None)
+    return {**record, "status": "done", "duration": round(duration, 2), **summary}
+
+def prefetch_transcripts(video_ids, store, fetcher):
+    """Fetches the transcripts that are not stored yet, concurrently, into the local store."""
+    missing = [video_id for video_id in video_ids if video_id not in store]
+    if missing:
+        print(f"🌐 Fetching {len(missing)} transcripts from YouTube API...")
+        store.put_many({video_id: transcript for video_id, transcript in fetcher.fetch_many(missing).items() if transcript})
+
+def run_batch(videos, writer, metrics=ALL_METRICS, workers=None, prefetch_batch=PREFETCH_BATCH):
+    """Analyzes videos over a process pool and writes each record as soon as it finishes.
+
+    Transcripts are fetched in the parent one batch ahead of the workers, so
+    the workers only read the local transcript store. Returns the count of
+    records per status.
+    """
+    from transcript_fetcher import TranscriptFetcher
+    from transcript_store import TranscriptStore
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def finish(video, future):
+        try:
+            record = future.result()
+        except Exception as e:
+            record = {**video, "video_id": extract_video_id(video["video_url"]), "status": "failed", "error": str(e)}
+        with lock:
+            writer.write(record)
+            statuses[record["status"]] += 1
+
+    store = TranscriptStore()
+    futures = []
+    # Workers are spawned rather than forked since the parent runs fetcher (and Gemini) threads
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(metrics,))
+    with pool, TranscriptFetcher() as fetcher:
+        for start in range(0, len(videos), prefetch_batch):
+            batch = videos[start:start + prefetch_batch]
+            for video in batch:
+                if not extract_video_id(video["video_url"]):
+                    with lock:
+                        writer.write({**video, "video_id": None, "status": "invalid_url"})
+                        statuses["invalid_url"] += 1
+            batch = [video for video in batch if extract_video_id(video["video_url"])]
+            prefetch_transcripts([extract_video_id(video["video_url"]) for video in batch], store, fetcher)
+            for video in batch:
+                future = pool.submit(analyze_record, video, metrics)
+                future.add_done_callback(lambda future, video=video: finish(video, future))
+                futures.append(future)
+        wait(futures)
+    store.close()
+    return statuses
+
+def run_sponsorships(videos, resume=False):
+    """app4's checkpointed sponsorship extraction for the videos that name an expected product."""
+    from app4 import SPONSORSHIP_MODEL, import_existing_results, process_videos, save_results_to_csv
+    videos = [video for video in videos if video["expected_product"]]
+    if not videos:
+        return
+    get_gemini(SPONSORSHIP_MODEL)
+    run = SponsorshipRun(resume=resume)
+    if resume:
+        import_existing_results(videos, run)
+    save_results_to_csv(process_videos(videos, run))
+    print(f"Sponsorship run summary: {run.summary()}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Speech analysis of many YouTube videos over a process pool.")
+    parser.add_argument("inputs", nargs="+", help="CSV files (video_url / Video URL, influencer, expected product) or URL lists")
+    parser.add_argument("-o", "--output", default="speech_analysis.jsonl",
+                        help="results file: .jsonl (a line per video as it finishes) or .parquet (a row group every "
+                             "BATCH_PARQUET_ROW_GROUP videos, or once BATCH_PARQUET_FLUSH_SECONDS have passed)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="worker processes (one spaCy model each)")
+    parser.add_argument("-m", "--metrics", default=",".join(ALL_METRICS), help=f"comma-separated subset of {','.join(ALL_METRICS)}")
+    parser.add_argument("--resume", action="store_true", help="skip videos already done in the JSONL output")
+    parser.add_argument("--sponsorship", action="store_true", help="also run app4's sponsorship extraction on rows with an expected product")
+    args = parser.parse_args(argv)
+
+    metrics = tuple(metric for metric in args.metrics.split(",") if metric)
+    unknown = set(metrics) - set(ALL_METRICS)
+    if unknown:
+        parser.error(f"unknown metrics: {', '.join(sorted(unknown))}")
+    videos = read_videos(args.inputs)
+    writer = open_writer(args.output, args.resume)
+    done = writer.done_urls()
+    pending = [video for video in videos if video["video_url"] not in done]
+    print(f"{len(videos) - len(pending)} videos already done, {len(pending)} to analyze with {args.workers} workers")
+
+    started = time.perf_counter()
+    # Gemini calls are I/O-bound, so the sponsorship run is a thread next to the worker processes
+    sponsorships = threading.Thread(target=run_sponsorships, args=(videos, args.resume))
+    if args.sponsorship:
+        sponsorships.start()
+    try:
+        statuses = run_batch(pending, writer, metrics, args.workers)
+    finally:
+        writer.close()
+    if args.sponsorship:
+        sponsorships.join()
+    print(f"✅ {dict(statuses)} in {time.perf_counter() - started:.1f} s, results in {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import gc
+import importlib
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from speech_analysis import (ALL_METRICS, analyze_sentiment, chunk_entries, compute_speech_metrics, count_words,
+                             extract_fillers, extract_focused_topics, metric_pipeline, pipe_docs, preprocess_text)
+
+# Stages in the order the analysis runs them; each one uses the outputs of the ones before
+STAGES = ("load", "preprocess", "parse", "speech_metrics", "fillers", "sentiment", "topics", "sponsorship_prompt")
+
+BASELINE_PATH = os.getenv("BENCHMARK_BASELINE", "benchmark_baseline.json")
+
+# A stage regresses when its throughput drops, or its peak memory grows, by more than this fraction of the baseline
+REGRESSION_THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", "0.25"))
+
+def load_corpus(folder="transcripts"):
+    """{video_id: transcript} of the cached transcripts, with the expected product of each from its sponsorship result."""
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        if path.endswith("_sponsorship.json"):
+            continue
+        video_id = os.path.basename(path)[:-len(".json")]
+        with open(path, "r", encoding="utf-8") as file:
+            corpus[video_id] = {"transcript": json.load(file), "influencer": "", "product": ""}
+        sponsorship_path = os.path.join(folder, f"{video_id}_sponsorship.json")
+        if os.path.exists(sponsorship_path):
+            with open(sponsorship_path, "r", encoding="utf-8") as file:
+                sponsorship = json.load(file)
+            corpus[video_id]["influencer"] = sponsorship.get("influencer_name") or ""
+            corpus[video_id]["product"] = sponsorship.get("expected_product") or sponsorship.get("product_name") or ""
+    return corpus
+
+def transcript_duration(transcript):
+    return max((entry["start"] + entry.get("duration", 0) for entry in transcript), default=0)
+
+def scale_transcript(transcript, scale):
+    """The transcript played scale times back to back, as one longer video."""
+    duration = transcript_duration(transcript)
+    return [{**entry, "start": round(entry["start"] + repeat * duration, 3)} for repeat in range(scale) for entry in transcript]
+
+# Each stage takes the state of one video and adds its outputs to it
+def _load(state):
+    state["entries"] = json.loads(state["payload"])
+
+def _preprocess(state):
+    state["chunks"] = [chunk for chunk in map(preprocess_text, chunk_entries([entry["text"] for entry in state["entries"]])) if chunk]
+    state["text"] = " ".join(state["chunks"])
+
+def _parse(state):
+    state["docs"] = list(pipe_docs(state["chunks"]))
+
+def _speech_metrics(state):
+    total_words = sum(count_words(doc) for doc in state["docs"])
+    state["speech_metrics"] = compute_speech_metrics(state["text"], transcript_duration(state["entries"]), total_words)
+
+def _fillers(state):
+    state["fillers"] = extract_fillers(state["text"])
+
+def _sentiment(state):
+    state["sentiment"] = [score for doc in state["docs"] for score in analyze_sentiment(doc)]
+
+def _topics(state):
+    state["topics"] = sum((Counter(dict(extract_focused_topics(doc))) for doc in state["docs"]), Counter()).most_common(10)
+
+def _sponsorship_prompt(state):
+    from app4 import sponsorship_prompt
+    state["prompt"] = sponsorship_prompt(state["entries"], state["influencer"], state["product"],
+                                         f"https://www.youtube.com/watch?v={state['video_id']}")
+
+STAGE_FUNCTIONS = {
+    "load": _load, "preprocess": _preprocess, "parse": _parse, "speech_metrics": _speech_metrics,
+    "fillers": _fillers, "sentiment": _sentiment, "topics": _topics, "sponsorship_prompt": _sponsorship_prompt,
+}
+
+def warm_up(stages):
+    # Model loading and imports happen once per process, so they are kept out of the first stage timings
+    if "parse" in stages:
+        metric_pipeline(ALL_METRICS)
+    if "sponsorship_prompt" in stages:
+        importlib.import_module("app4")
+
+def _run_stage(function, state, memory):
+    # Timed without tracing; peak memory comes from a second, traced run of the same stage
+    gc.collect()
+    started = time.perf_counter()
+    function(state)
+    seconds = time.perf_counter() - started
+    peak = 0
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        function(dict(state))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak
+
+def run_benchmark(corpus, scale=1, stages=STAGES, memory=True):
+    """Runs the stages over every video of the corpus at scale; per stage: seconds, entries/s, tokens/s, peak MB.
+
+    Stages a selection leaves out still run when later stages need their
+    outputs, but are not reported. Peak memory is the largest of any one video.
+    """
+    needed = STAGES[:max(STAGES.index(stage) for stage in stages) + 1]
+    warm_up(needed)
+    totals = {stage: {"seconds": 0.0, "peak_bytes": 0} for stage in needed}
+    entries = tokens = 0
+    for video_id, video in corpus.items():
+        scaled = scale_transcript(video["transcript"], scale)
+        entries += len(scaled)
+        tokens += sum(len(entry["text"].split()) for entry in scaled)
+        state = {"video_id": video_id, "influencer": video["influencer"], "product": video["product"],
+                 "payload": json.dumps(scaled)}
+        del scaled
+        for stage in needed:
+            seconds, peak = _run_stage(STAGE_FUNCTIONS[stage], state, memory and stage in stages)
+            totals[stage]["seconds"] += seconds
+            totals[stage]["peak_bytes"] = max(totals[stage]["peak_bytes"], peak)
+    return {
+        stage: {
+            "seconds": round(totals[stage]["seconds"], 4),
+            "entries_per_second": round(entries / totals[stage]["seconds"], 1) if totals[stage]["seconds"] else 0,
+            "tokens_per_second": round(tokens / totals[stage]["seconds"], 1) if totals[stage]["seconds"] else 0,
+            "peak_mb": round(totals[stage]["peak_bytes"] / 2 ** 20, 2) if memory else None,
+            "entries": entries, "tokens": tokens,
+        }
+        for stage in stages
+    }
+
+def environment():
+    from model_registry import get_registry
+    return {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "spacy": get_registry().spacy_signature()}
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Regressions of results against a baseline: (scale, stage, metric, baseline value, new value)."""
+    regressions = []
+    for scale, stages in results.items():
+        for stage, result in stages.items():
+            expected = baseline.get("results", {}).get(scale, {}).get(stage)
+            if not expected:
+                continue
+            for metric in ("entries_per_second", "tokens_per_second"):
+                if expected[metric] and result[metric] < expected[metric] * (1 - threshold):
+                    regressions.append((scale, stage, metric, expected[metric], result[metric]))
+            if expected.get("peak_mb") and result["peak_mb"] is not None and result["peak_mb"] > expected["peak_mb"] * (1 + threshold):
+                regressions.append((scale, stage, "peak_mb", expected["peak_mb"], result["peak_mb"]))
+    return regressions
+
+def _change(stage_result, expected, metric):
+    if not expected or not expected.get(metric) or stage_result[metric] is None:
+        return ""
+    return f" ({(stage_result[metric] / expected[metric] - 1) * 100:+.0f}%)"
+
+def print_results(scale, results, baseline=None):
+    expected_stages = (baseline or {}).get("results", {}).get(str(scale), {})
+    first = next(iter(results.values()))
+    print(f"\n📊 {scale}x corpus: {first['entries']:,} entries, {first['tokens']:,} tokens")
+    for stage, result in results.items():
+        expected = expected_stages.get(stage)
+        memory = f"{result['peak_mb']:>9.1f} MB{_change(result, expected, 'peak_mb')}" if result["peak_mb"] is not None else ""
+        print(f"  {stage:<19}{result['seconds']:>9.2f} s{result['entries_per_second']:>13,.0f} entries/s"
+              f"{result['tokens_per_second']:>14,.0f} tokens/s{_change(result, expected, 'tokens_per_second')}  {memory}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage throughput and peak memory over the cached transcripts.")
+    parser.add_argument("--scales", default="1,10,100", help="comma-separated corpus multiples (each transcript repeated back to back)")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--folder", default="transcripts")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="allowed fractional slowdown or memory growth")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory runs")
+    args = parser.parse_args()
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        sys.exit(f"❌ Unknown stages: {', '.join(sorted(unknown))}")
+    stages = [stage for stage in STAGES if stage in stages]
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("environment") != environment():
+            print(f"⚠️ Baseline was recorded on {baseline.get('environment')}; this is {environment()}")
+
+    corpus = load_corpus(args.folder)
+    results = {}
+    for scale in (int(scale) for scale in args.scales.split(",")):
+        results[str(scale)] = run_benchmark(corpus, scale, stages, memory=not args.no_memory)
+        print_results(scale, results[str(scale)], baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump({"environment": environment(), "results": results}, file, indent=2)
+        print(f"\n✅ Saved baseline to {args.baseline}")
+    elif baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for scale, stage, metric, expected, actual in regressions:
+            print(f"❌ {scale}x {stage}: {metric} {expected} -> {actual}")
+        if regressions:
+            sys.exit(1)
+        print(f"\n✅ No stage regressed by more than {args.threshold:.0%} against {args.baseline}")
@@ -0,0 +1,75 @@
+import glob
+import json
+import os
+import re
+import sys
+import time
+import contractions
+from model_registry import get_nlp
+
+# Brackets dropped from caption lines before tokenizing
+BRACKETS = re.compile(r"[\[\](){}]")
+
+# contractions.fix runs once over all lines joined with this separator
+LINE_SEPARATOR = "\n"
+
+# Lines passed to the tokenizer at a time
+TOKENIZER_BATCH = 1000
+
+def clean_lines(lines):
+    """Lowercases, expands contractions, drops brackets, punctuation and whitespace tokens.
+
+    Same output as cleaning each line with contractions.fix, the bracket regex
+    and a full spaCy parse, but each distinct line is cleaned once:
+    contractions are expanded in a single call over all of them and only the
+    spaCy tokenizer runs, in batches.
+    """
+    lines = list(lines)
+    unique = list(dict.fromkeys(lines))
+    # A newline inside a caption only ever produced a whitespace token, so it can become a space
+    lowered = [line.lower().replace(LINE_SEPARATOR, " ") for line in unique]
+    fixed = contractions.fix(LINE_SEPARATOR.join(lowered)).split(LINE_SEPARATOR)
+    if len(fixed) != len(unique):
+        # A contraction replacement spanned a separator; fall back to one call per line
+        fixed = [contractions.fix(line) for line in lowered]
+    tokenizer = get_nlp(()).tokenizer
+    cleaned = {
+        line: " ".join(token.text for token in doc if not token.is_punct and not token.is_space)
+        for line, doc in zip(unique, tokenizer.pipe((BRACKETS.sub("", text) for text in fixed), batch_size=TOKENIZER_BATCH))
+    }
+    return [cleaned[line] for line in lines]
+
+# Reference implementation clean_lines must agree with (app3's original per-line cleaning)
+def _reference_clean_lines(lines):
+    nlp = get_nlp()
+    cleaned_lines = []
+    for text in lines:
+        processed_text = contractions.fix(text.lower())
+        processed_text = re.sub(r'[\[\](){}]', '', processed_text)
+        doc = nlp(processed_text)
+        cleaned_lines.append(" ".join(token.text for token in doc if not token.is_punct and not token.is_space))
+    return cleaned_lines
+
+def check_parity(folder="transcripts"):
+    """Cleans every cached transcript both ways and times them."""
+    reference_seconds = batch_seconds = 0.0
+    lines_checked = mismatches = 0
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        if path.endswith("_sponsorship.json"):
+            continue
+        with open(path, "r", encoding="utf-8") as file:
+            lines = [entry["text"] for entry in json.load(file)]
+        started = time.perf_counter()
+        expected = _reference_clean_lines(lines)
+        reference_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        actual = clean_lines(lines)
+        batch_seconds += time.perf_counter() - started
+        lines_checked += len(lines)
+        mismatches += sum(1 for a, b in zip(actual, expected) if a != b) + abs(len(actual) - len(expected))
+    print(f"Parity: {lines_checked - mismatches}/{lines_checked} lines match")
+    print(f"Per-line nlp(): {reference_seconds * 1000:.0f} ms, batched: {batch_seconds * 1000:.0f} ms")
+    return mismatches == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_parity() else 1)
@@ -1,29 +1,38 @@
+import itertools
+import json
 import os
 import re
-import spacy
-import contractions
-import google.generativeai as genai
+from concurrent.futures import as_completed
 import pandas as pd
 import plotly.express as px
 import streamlit as st
-from textblob import TextBlob
-from collections import Counter
-from youtube_transcript_api import YouTubeTranscriptApi
 from dotenv import load_dotenv
+from speech_analysis import categorize_sentiment_totals, merge_counts, summarize_counts
+from speech_timeline import TIMELINE_COLUMNS
+from speaker_metrics import speaker_metrics
+from analysis_cache import analyze_video, is_cached
+from transcript_fetcher import TranscriptFetcher
+from gemini_client import QuotaScheduler
+from instrumentation import INSTRUMENTATION, Recorder, llm_summary, span, span_summary, use_recorder
+from model_registry import ModelRegistry, get_gemini, use_registry
+from llm_map_reduce import map_reduce
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-gemini_model = genai.GenerativeModel("gemini-1.5-pro")
+# spaCy and Gemini models load on first use and are shared across reruns
+# (st.cache_resource keeps them when Streamlit reloads a changed module)
+use_registry(st.cache_resource(ModelRegistry)())
+GEMINI_MODEL = "gemini-1.5-pro"
+# One quota scheduler for every session and rerun, so they share the rate limits
+gemini_scheduler = st.cache_resource(QuotaScheduler)()
 
-# Load spaCy English model
-nlp = spacy.load("en_core_web_sm")
+# Worker processes used by spaCy when parsing transcript chunks
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))
 
-# Define filler words
-FILLER_WORDS = {"uh", "um", "er", "ah", "like", "well", "right", "okay", "yeah"}
-COMMON_VERBS = {"have", "do", "be", "get", "make", "go", "say", "know", "think", "see", "take"}
+# Shared transcript fetcher with bounded concurrency, retries and backoff
+# (cached so reruns reuse its worker pool instead of starting a new one)
+transcript_fetcher = st.cache_resource(TranscriptFetcher)()
 
 # Extract video ID from URL
 def extract_video_id(url):
@@ -32,142 +41,48 @@ def extract_video_id(url):
 
 # Fetch YouTube transcript
 def get_youtube_transcript(video_id):
-    try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        if not transcript:
-            return "", 0
-        transcript_text = " ".join(entry["text"] for entry in transcript)
-        duration_seconds = transcript[-1]["start"] + transcript[-1].get("duration", 0)
-        return transcript_text, duration_seconds
-    except Exception:
-        return "", 0
-
-# Preprocess text
-def preprocess_text(text):
-    if not text:
-        return ""
-    text = contractions.fix(text.lower())
-    text = re.sub(r"[^\w\s]", "", text)
-    return text.strip()
-
-# Count words using spaCy
-def count_words(text):
-    doc = nlp(text)
-    return sum(1 for token in doc if token.is_alpha)
-
-# Compute speech metrics
-def compute_speech_metrics(text, duration_seconds):
-    total_words = count_words(text)
-    unique_words = len(set(text.split()))
-    filler_count = sum(count for _, count in extract_fillers(text))
-    filler_percentage = round((filler_count / total_words) * 100, 2) if total_words > 0 else 0
-    speaking_pace = round(total_words / (duration_seconds / 60), 2) if duration_seconds > 0 else 0
-    return total_words, unique_words, filler_percentage, speaking_pace
-
-# Extract most used words
-def extract_most_used_words(text):
-    doc = nlp(text)
-    words = [
-        token.text for token in doc
-        if token.is_alpha and not token.is_stop and token.pos_ in {"NOUN", "VERB", "ADJ", "ADV"}
-        and token.lemma_ not in COMMON_VERBS
-    ]
-    return Counter(words).most_common(10)
-
-# Extract filler words
-def extract_fillers(text):
-    words = text.split()
-    return Counter(word for word in words if word in FILLER_WORDS).most_common(5)
-
-# Extract filler phrases
-def extract_filler_phrases(text):
-    words = text.split()
-    two_word_phrases = Counter(" ".join(words[i:i+2]) for i in range(len(words) - 1) if words[i] in FILLER_WORDS)
-    three_word_phrases = Counter(" ".join(words[i:i+3]) for i in range(len(words) - 2) if words[i] in FILLER_WORDS)
-    return two_word_phrases.most_common(5), three_word_phrases.most_common(5)
-
-# Analyze sentiment
-def analyze_sentiment(text):
-    if not text:
-        return []
-    
-    doc = nlp(text)
-    sentences = [sent.text for sent in doc.sents]
-    sentiment_scores = [(sent, TextBlob(sent).sentiment.polarity) for sent in sentences]
-    return sentiment_scores
-
-# Categorize sentiment
-def categorize_sentiment(sentiment_scores):
-    total = len(sentiment_scores)
-    if total == 0:
-        return {"Positive": 0, "Neutral": 0, "Negative": 0}
-
-    positive = sum(1 for _, score in sentiment_scores if score > 0)
-    neutral = sum(1 for _, score in sentiment_scores if score == 0)
-    negative = sum(1 for _, score in sentiment_scores if score < 0)
-
-    overall_sentiment = sum(score for _, score in sentiment_scores) / total
-    sentiment_label = "Positive" if overall_sentiment > 0 else "Neutral" if overall_sentiment == 0 else "Negative"
-
-    return {
-        "Positive": round((positive / total) * 100, 2),
-        "Neutral": round((neutral / total) * 100, 2),
-        "Negative": round((negative / total) * 100, 2),
-        "Overall Sentiment": overall_sentiment,
-        "Label": sentiment_label
-    }
-
-# Get most positive and negative segments
-def extract_sentiment_segments(sentiment_scores, top_n=2):
-    sorted_scores = sorted(sentiment_scores, key=lambda x: x[1])
-    most_negative = sorted_scores[:top_n]
-    most_positive = sorted_scores[-top_n:]
-    
-    return {
-        "Most Positive": [(sent, round(score, 2)) for sent, score in most_positive],
-        "Most Negative": [(sent, round(score, 2)) for sent, score in most_negative]
-    }
-    
-def extract_focused_topics(cleaned_text, top_n=10):
-    if not cleaned_text:
-        return []
-
-    doc = nlp(cleaned_text)
-
-    # Extract Named Entities (NER) - Focus on meaningful categories
-    entities = [
-        ent.text.lower() for ent in doc.ents 
-        if ent.label_ in {"PERSON", "ORG", "GPE", "PRODUCT", "EVENT", "WORK_OF_ART"}
-    ]
+    return transcript_fetcher.fetch(video_id)
 
-    # Extract Important Noun Phrases (Filtering stopwords & pronouns)
-    noun_phrases = [
-        chunk.text.lower() for chunk in doc.noun_chunks
-        if len(chunk.text.split()) > 1 and not any(token.is_stop or token.pos_ == "PRON" for token in chunk)
-    ]
-
-    # Combine & count frequencies
-    all_topics = entities + noun_phrases
-    topic_counts = Counter(all_topics)
-
-    # Get top N topics
-    return topic_counts.most_common(top_n)
-
-
-# Get communication improvement suggestions
-def get_gemini_suggestions(transcript_text):
-    if not transcript_text:
-        return "No transcript available for analysis."
-    prompt = (
+# Prompts for the suggestions; long transcripts are reviewed in parts and merged
+def suggestions_prompt(transcript_text):
+    return (
         "Analyze the following speech transcript and provide exactly **5 key suggestions** for improvement. "
         "Base the suggestions purely on the content, structure, and delivery of the speech. "
         "Keep each point **clear, concise, and actionable**.\n\n"
         f"Transcript:\n{transcript_text}"
     )
-    response = gemini_model.generate_content(prompt)
-    if response and response.text:
-        suggestions = re.findall(r"^\d+\.\s.*", response.text, re.MULTILINE)
-        return "\n".join(suggestions[:5]) if suggestions else response.text
+
+def part_review_prompt(chunk, index, total):
+    return (
+        f"You are reviewing part {index + 1} of {total} of a speech transcript. "
+        "List the main strengths and weaknesses of its content, structure, and delivery as short bullet points. "
+        "Only describe what is in this part.\n\n"
+        f"Transcript part:\n{chunk}"
+    )
+
+def merge_reviews_prompt(findings):
+    notes = "\n\n".join(f"Part {index + 1}:\n{text}" for index, text in enumerate(findings))
+    return (
+        "Below are review notes on consecutive parts of one speech transcript. "
+        "Based on them, provide exactly **5 key suggestions** for improving the speech as a whole. "
+        "Base the suggestions purely on the content, structure, and delivery of the speech. "
+        "Keep each point **clear, concise, and actionable**.\n\n"
+        f"Review notes:\n{notes}"
+    )
+
+# Get communication improvement suggestions; transcript_entries are the videos'
+# utterances in order, so long transcripts are split between utterances
+def get_gemini_suggestions(transcript_entries):
+    transcript_entries = [entry for entry in transcript_entries if entry]
+    if not transcript_entries:
+        return "No transcript available for analysis."
+    text = map_reduce(
+        get_gemini(GEMINI_MODEL), transcript_entries, part_review_prompt, merge_reviews_prompt,
+        direct_prompt=suggestions_prompt, scheduler=gemini_scheduler,
+    )
+    if text:
+        suggestions = re.findall(r"^\d+\.\s.*", text, re.MULTILINE)
+        return "\n".join(suggestions[:5]) if suggestions else text
     return "No suggestions generated."
 
 st.set_page_config(layout="wide")
@@ -198,52 +113,95 @@ st.markdown("""
 st.markdown('<p class="title">🎙️ Speaker Analysis Dashboard</p>', unsafe_allow_html=True)
 st.markdown('<p class="subtitle">Analyze speech patterns and improve communication effectiveness</p>', unsafe_allow_html=True)
 
+# Debug panel with the timings and Gemini calls of each run (on by default with INSTRUMENTATION=1);
+# each run records into its own recorder, so the toggle only affects this session
+debug = st.sidebar.checkbox("🛠️ Show debug panel", value=INSTRUMENTATION)
+run_recorder = Recorder(enabled=True) if debug else None
+use_recorder(run_recorder)
+
 # LINKS INPUT
 container = st.container(border=True)  
 with container:
     urls_input = st.text_area("Enter YouTube URLs (one per line):", height=150)
     urls = [url.strip() for url in urls_input.split("\n") if url.strip()]
 
-if st.button("Analyze"):
-    all_transcripts = []
-    total_duration_seconds = 0  
-    invalid_urls = []
-
-    with st.spinner("Fetching transcripts..."):
-        for url in urls:
-            video_id = extract_video_id(url)
-            if video_id:
-                transcript_text, duration = get_youtube_transcript(video_id)
-                if transcript_text:
-                    all_transcripts.append(transcript_text)
-                    total_duration_seconds += duration  
-                else:
-                    invalid_urls.append(url)
-            else:
-                invalid_urls.append(url)
-
-    if invalid_urls:
-        st.warning(f"⚠️ Invalid or missing transcripts for: {', '.join(invalid_urls)}")
-
-    if not all_transcripts:
-        st.error("❌ No valid YouTube transcripts found.")
-    else:
-        combined_text = preprocess_text(" ".join(all_transcripts))
+# Analysis results are kept in the session, so reruns triggered by widgets
+# (e.g. switching the timeline chart) redraw from memory without recomputing
+if "video_results" not in st.session_state:
+    st.session_state.video_results = {}   # video ID -> per-video counts, duration, summary and timeline
+    st.session_state.failed_videos = set()
+    st.session_state.corpus_summaries = {}  # tuple of video IDs -> merged summary
+    st.session_state.suggestions = {}       # tuple of video IDs -> Gemini suggestions
+    st.session_state.analyzed_urls = []
 
-        # --- Compute Speech Metrics ---
-        with st.spinner("Computing speech metrics..."):
-            total_words, unique_words, filler_percentage, speaking_pace = compute_speech_metrics(combined_text, total_duration_seconds)
+if st.button("Analyze"):
+    st.session_state.analyzed_urls = urls
+    st.session_state.failed_videos = set()
+
+TIMELINE_METRICS = {"Speaking Pace (wpm)": "pace", "Fillers per 100 Words": "filler_density", "Sentiment": "sentiment"}
+
+def plot_bar_chart(data, title, color, key):
+    df = pd.DataFrame(data, columns=["Word", "Count"])
+    fig = px.bar(df, x="Word", y="Count", title=title, color="Count", color_continuous_scale=color)
+    st.plotly_chart(fig, use_container_width=True, key=key)
+
+def plot_timeline(timeline, metric_label, key):
+    fig = px.line(timeline, x="minute", y=TIMELINE_METRICS[metric_label], color="video", title=metric_label)
+    st.plotly_chart(fig, use_container_width=True, key=key)
+
+# Analyze one video and keep everything its card needs in the session
+def store_video_result(video_id, analyzed):
+    if not analyzed:
+        st.session_state.failed_videos.add(video_id)
+        return
+    counts, duration = analyzed
+    timeline = pd.DataFrame(counts["timeline"], columns=TIMELINE_COLUMNS).assign(video=video_id)
+    timeline["minute"] = timeline["start"] / 60
+    st.session_state.video_results[video_id] = {
+        "counts": counts,
+        "duration": duration,
+        "summary": summarize_counts(counts, duration, metrics=("words", "fillers")),
+        "timeline": timeline,
+    }
 
-        # --- Extract Insights ---
-        with st.spinner("Extracting key insights..."):
-            most_used_words = extract_most_used_words(combined_text)
-            filler_words = extract_fillers(combined_text)
-            two_word_fillers, three_word_fillers = extract_filler_phrases(combined_text)
+# Corpus-level summary, merged from the per-video counts and memoized per set of videos
+def corpus_summary(video_ids):
+    key = tuple(video_ids)
+    if key not in st.session_state.corpus_summaries:
+        results = [st.session_state.video_results[video_id] for video_id in video_ids]
+        st.session_state.corpus_summaries[key] = summarize_counts(
+            merge_counts([result["counts"] for result in results]),
+            sum(result["duration"] for result in results),
+            top_topics=5,
+        )
+    return st.session_state.corpus_summaries[key]
+
+def render_video(slot, url, video_id, metric_label, key):
+    with slot.container(border=True):
+        if video_id in st.session_state.failed_videos:
+            st.warning(f"⚠️ Invalid or missing transcript for: {url}")
+            return
+        result = st.session_state.video_results.get(video_id)
+        if not result:
+            st.caption(f"⏳ Waiting for {url}")
+            return
+        summary = result["summary"]
+        st.markdown(f"**{url}**")
+        col_v1, col_v2, col_v3, col_v4 = st.columns(4)
+        col_v1.metric("Total Words", summary["total_words"])
+        col_v2.metric("Unique Words", summary["unique_words"])
+        col_v3.metric("Filler Word %", f"{summary['filler_percentage']}%")
+        col_v4.metric("Speaking Pace", f"{summary['speaking_pace']} wpm")
+        plot_timeline(result["timeline"], metric_label, key=f"video-{key}-timeline")
+
+# revision makes the chart keys unique when the corpus is drawn again in the same run
+def render_corpus(slot, video_ids, metric_label, revision):
+    analysis = corpus_summary(video_ids)
+    with slot.container():
+        st.caption(f"Corpus of {len(video_ids)} analyzed video(s)")
 
         # --- Word Analysis & Sentiment Analysis ---
-        container = st.container(border=True)
-        container = st.container(border=True)
-        with st.container():
+        with st.container(border=True):
             col1, col2 = st.columns(2)  # Two equal-width columns
 
             # --- Word Analysis ---
@@ -251,16 +209,15 @@ if st.button("Analyze"):
                 st.subheader("📊 Word Analysis")
                 col_w1, col_w2, col_w3, col_w4 = st.columns([1.5, 1.5, 1, 2])  # Adjusted column widths
 
-                col_w1.metric("Total Words", total_words)
-                col_w2.metric("Unique Words", unique_words)
-                col_w3.metric("Filler Word %", f"{filler_percentage}%")
-                col_w4.metric("Speaking Pace", f"{speaking_pace} wpm")
+                col_w1.metric("Total Words", analysis["total_words"])
+                col_w2.metric("Unique Words", analysis["unique_words"])
+                col_w3.metric("Filler Word %", f"{analysis['filler_percentage']}%")
+                col_w4.metric("Speaking Pace", f"{analysis['speaking_pace']} wpm")
 
             # --- Sentiment Analysis ---
             with col2:
                 st.subheader("📊 Sentiment Analysis")
-                sentiment_scores = analyze_sentiment(combined_text)
-                sentiment_results = categorize_sentiment(sentiment_scores)
+                sentiment_results = categorize_sentiment_totals(analysis["sentiment_totals"])
 
                 # Styled sentiment display
                 st.markdown(f"""
@@ -275,85 +232,172 @@ if st.button("Analyze"):
                 col_s3.metric("😢 Negative", f"{sentiment_results['Negative']}%")
 
         # --- Graphs Section ---
-        container = st.container(border=True)
-        with container:
+        with st.container(border=True):
             st.subheader("📊 Word Usage & Speech Patterns")
             col_g1, col_g2, col_g3, col_g4 = st.columns(4)
 
-            def plot_bar_chart(data, title, color):
-                df = pd.DataFrame(data, columns=["Word", "Count"])
-                fig = px.bar(df, x="Word", y="Count", title=title, color="Count", color_continuous_scale=color)
-                st.plotly_chart(fig, use_container_width=True)
-
             with col_g1:
-                plot_bar_chart(most_used_words, "Most Used Words", "blues")
+                plot_bar_chart(analysis["most_used_words"], "Most Used Words", "blues", key=f"corpus-{revision}-words")
             with col_g2:
-                plot_bar_chart(filler_words, "Filler Words", "reds")
+                plot_bar_chart(analysis["filler_words"], "Filler Words", "reds", key=f"corpus-{revision}-fillers")
             with col_g3:
-                plot_bar_chart(two_word_fillers, "2-Word Filler Phrases", "purples")
+                plot_bar_chart(analysis["two_word_fillers"], "2-Word Filler Phrases", "purples", key=f"corpus-{revision}-two")
             with col_g4:
-                plot_bar_chart(three_word_fillers, "3-Word Filler Phrases", "pinkyl")
-
+                plot_bar_chart(analysis["three_word_fillers"], "3-Word Filler Phrases", "pinkyl", key=f"corpus-{revision}-three")
+            if analysis["multi_word_fillers"]:
+                plot_bar_chart(analysis["multi_word_fillers"], "Multi-Word Fillers (you know, i mean, ...)", "oranges",
+                               key=f"corpus-{revision}-multi")
+
+        # --- Delivery Over Time ---
+        with st.container(border=True):
+            st.subheader("⏱️ Delivery Over Time")
+            timeline = pd.concat([st.session_state.video_results[video_id]["timeline"] for video_id in video_ids],
+                                 ignore_index=True)
+            plot_timeline(timeline, metric_label, key=f"corpus-{revision}-timeline")
 
         # --- Speaker Focus Topics ---
-        container = st.container(border=True)
-        with st.spinner("Extracting focused topics..."):
-            container = st.container(border=True)  
-            with container:
-                focused_topics = extract_focused_topics(preprocess_text(combined_text), top_n=5)
-                st.subheader("🎯 Speaker's Focused Topics")
-
-                st.markdown(
-                        """
-                        <style>
-                            .circle-container {
-                                display: flex;
-                                flex-wrap: nowrap;
-                                gap: 20px;
-                                justify-content: space-evenly;
-                                align-items: center;
-                                margin-top: 20px;
-                                overflow-x: auto;
-                                white-space: nowrap;
-                                padding: 10px;
-                            }
-                            .topic-bubble {
-                                min-width: 140px;
-                                height: 140px;
-                                font-weight: bold;
-                                font-size: 14px;
-                                display: flex;
-                                justify-content: center;
-                                align-items: center;
-                                text-align: center;
-                                border-radius: 50%;
-                                padding: 15px;
-                                word-wrap: break-word;
-                                overflow-wrap: break-word;
-                                white-space: normal;
-                                text-overflow: ellipsis;
-                            }
-                            /* Gradient background effect for 5 bubbles */
-                            .topic-bubble:nth-child(1) { background: linear-gradient(to bottom, #A569BD, #D2B4DE); color: #4A148C; } /* Purple */
-                            .topic-bubble:nth-child(2) { background: linear-gradient(to bottom, #5499C7, #AED6F1); color: #1A5276; } /* Blue */
-                            .topic-bubble:nth-child(3) { background: linear-gradient(to bottom, #48C9B0, #A2D9CE); color: #0B5345; } /* Green */
-                            .topic-bubble:nth-child(4) { background: linear-gradient(to bottom, #F5B041, #FAD7A0); color: #935116; } /* Orange */
-                            .topic-bubble:nth-child(5) { background: linear-gradient(to bottom, #EC7063, #F5B7B1); color: #7B241C; } /* Red */
-                        </style>
-                        """,
-                        unsafe_allow_html=True
-                    )
-
+        with st.container(border=True):
+            st.subheader("🎯 Speaker's Focused Topics")
+            st.markdown(
+                    """
+                    <style>
+                        .circle-container {
+                            display: flex;
+                            flex-wrap: nowrap;
+                            gap: 20px;
+                            justify-content: space-evenly;
+                            align-items: center;
+                            margin-top: 20px;
+                            overflow-x: auto;
+                            white-space: nowrap;
+                            padding: 10px;
+                        }
+                        .topic-bubble {
+                            min-width: 140px;
+                            height: 140px;
+                            font-weight: bold;
+                            font-size: 14px;
+                            display: flex;
+                            justify-content: center;
+                            align-items: center;
+                            text-align: center;
+                            border-radius: 50%;
+                            padding: 15px;
+                            word-wrap: break-word;
+                            overflow-wrap: break-word;
+                            white-space: normal;
+                            text-overflow: ellipsis;
+                        }
+                        /* Gradient background effect for 5 bubbles */
+                        .topic-bubble:nth-child(1) { background: linear-gradient(to bottom, #A569BD, #D2B4DE); color: #4A148C; } /* Purple */
+                        .topic-bubble:nth-child(2) { background: linear-gradient(to bottom, #5499C7, #AED6F1); color: #1A5276; } /* Blue */
+                        .topic-bubble:nth-child(3) { background: linear-gradient(to bottom, #48C9B0, #A2D9CE); color: #0B5345; } /* Green */
+                        .topic-bubble:nth-child(4) { background: linear-gradient(to bottom, #F5B041, #FAD7A0); color: #935116; } /* Orange */
+                        .topic-bubble:nth-child(5) { background: linear-gradient(to bottom, #EC7063, #F5B7B1); color: #7B241C; } /* Red */
+                    </style>
+                    """,
+                    unsafe_allow_html=True
+                )
 
             topic_html = '<div class="circle-container">'
-            for topic, _ in focused_topics:
+            for topic, _ in analysis["focused_topics"]:
                 topic_html += f'<div class="topic-bubble">{topic}</div>'
             topic_html += "</div>"
             st.markdown(topic_html, unsafe_allow_html=True)
 
+if st.session_state.analyzed_urls:
+    analyzed_urls = st.session_state.analyzed_urls
+    video_ids = {url: extract_video_id(url) for url in analyzed_urls}
+    ordered_ids = list(dict.fromkeys(video_id for video_id in video_ids.values() if video_id))
+    invalid_urls = [url for url, video_id in video_ids.items() if not video_id]
+    if invalid_urls:
+        st.warning(f"⚠️ Invalid YouTube URLs: {', '.join(invalid_urls)}")
+
+    metric_label = st.radio("Timeline metric", list(TIMELINE_METRICS), horizontal=True)
+    corpus_slot = st.empty()
+    st.subheader("🎬 Videos")
+    video_slots = {url: st.empty() for url in analyzed_urls if video_ids[url]}
+
+    # Every redraw in this run gets new chart keys, even when a failed video left the results unchanged
+    renders = itertools.count(1)
+
+    def refresh(video_id=None):
+        revision = next(renders)
+        for index, (url, slot) in enumerate(video_slots.items()):
+            if video_id is None or video_ids[url] == video_id:
+                render_video(slot, url, video_ids[url], metric_label, key=f"{index}-{revision}")
+        done = [video_id for video_id in ordered_ids if video_id in st.session_state.video_results]
+        if done:
+            render_corpus(corpus_slot, done, metric_label, revision)
+
+    # Everything already in the session renders straight away
+    refresh()
+
+    # Remaining videos are analyzed independently and shown as each one finishes:
+    # cached analyses first, then the others in the order their transcripts arrive
+    missing = [video_id for video_id in ordered_ids
+               if video_id not in st.session_state.video_results and video_id not in st.session_state.failed_videos]
+    if missing:
+        with st.spinner("Fetching and analyzing transcripts..."):
+            for video_id in [video_id for video_id in missing if is_cached(video_id)]:
+                store_video_result(video_id, analyze_video(video_id, get_youtube_transcript))
+                refresh(video_id)
+            pending = {transcript_fetcher.submit(video_id): video_id for video_id in missing if not is_cached(video_id)}
+            for future in as_completed(pending):
+                video_id = pending[future]
+                store_video_result(video_id, analyze_video(video_id, lambda _: future.result(), n_process=SPACY_N_PROCESS))
+                refresh(video_id)
+
+    done = [video_id for video_id in ordered_ids if video_id in st.session_state.video_results]
+    if not done:
+        st.error("❌ No valid YouTube transcripts found.")
+    else:
         # --- Suggestions/Analysis Comments ---
         container = st.container(border=True)
         with container:
             st.subheader("📌 Suggestions & Analysis Comments")
-            suggestions = get_gemini_suggestions(combined_text)
-            st.write(suggestions)
+            key = tuple(done)
+            if key not in st.session_state.suggestions:
+                with st.spinner("Generating suggestions..."), span("suggestions", videos=len(done)):
+                    st.session_state.suggestions[key] = get_gemini_suggestions([
+                        utterance for video_id in done
+                        for utterance in st.session_state.video_results[video_id]["counts"]["utterances"]
+                    ])
+            st.write(st.session_state.suggestions[key])
+
+# --- Per-Speaker Analysis ---
+# Diarized recordings (speech_service.py writes one speaker-labeled .jsonl per
+# recording) are scored per speaker, so a host and a guest are not averaged together
+with st.container(border=True):
+    st.subheader("👥 Per-Speaker Analysis")
+    diarized_file = st.file_uploader("Upload a speaker-labeled transcript (.jsonl from speech_service.py)", type=["jsonl"])
+    if diarized_file is not None:
+        records = [json.loads(line) for line in diarized_file.getvalue().decode("utf-8").splitlines() if line.strip()]
+        speakers = pd.DataFrame(speaker_metrics(records))
+        if speakers.empty:
+            st.warning("⚠️ No speaker-labeled segments found in the file.")
+        else:
+            st.dataframe(speakers[["speaker", "turns", "speaking_seconds", "share_of_time", "total_words", "unique_words",
+                                   "speaking_pace", "filler_percentage", "sentiment_label", "overall_sentiment"]],
+                         hide_index=True, use_container_width=True)
+            col_p1, col_p2 = st.columns(2)
+            with col_p1:
+                st.plotly_chart(px.bar(speakers, x="speaker", y="speaking_pace", title="Speaking Pace (wpm)"),
+                                use_container_width=True, key="speakers-pace")
+            with col_p2:
+                st.plotly_chart(px.bar(speakers, x="speaker", y="filler_percentage", title="Filler Word %"),
+                                use_container_width=True, key="speakers-fillers")
+
+# --- Debug Panel ---
+if debug:
+    with st.expander("🛠️ Debug: stage timings and Gemini calls of this run", expanded=True):
+        run_records = run_recorder.records()
+        if not run_records:
+            st.caption("Nothing was recorded in this run; every result came from the session.")
+        else:
+            st.caption("Recorded in this session's run (a transcript another session was already fetching is recorded there).")
+            st.dataframe(pd.DataFrame(span_summary(run_records)).round(4), hide_index=True, use_container_width=True)
+            llm_calls = [record for record in run_records if record["type"] == "llm"]
+            if llm_calls:
+                st.write(llm_summary(run_records))
+                st.dataframe(pd.DataFrame(llm_calls).drop(columns=["type", "seq"]), hide_index=True, use_container_width=True)
@@ -0,0 +1,148 @@
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+from itertools import compress, count
+
+# Define filler words
+FILLER_WORDS = {"uh", "um", "er", "ah", "like", "well", "right", "okay", "yeah"}
+FILLER_PHRASES = {"you know", "i mean", "sort of", "kind of", "you see", "i guess", "or something"}
+
+class FillerLexicon:
+    """Configurable set of single-word fillers and multi-word filler phrases."""
+
+    def __init__(self, words=FILLER_WORDS, phrases=FILLER_PHRASES):
+        self.words = set(words)
+        self.phrases = sorted(tuple(phrase.split()) for phrase in phrases)
+        # Phrases by first and second word, and every word a scan has to stop at
+        self.phrases_by_first = {}
+        for phrase in self.phrases:
+            if len(phrase) > 1:
+                self.phrases_by_first.setdefault(phrase[0], {}).setdefault(phrase[1], []).append((list(phrase), " ".join(phrase)))
+        self.marked = self.words | set(self.phrases_by_first)
+
+DEFAULT_LEXICON = FillerLexicon()
+
+class ScannedText:
+    """Whitespace tokens of a text and, from one pass over them, where fillers and filler phrases start."""
+
+    def __init__(self, text, lexicon=DEFAULT_LEXICON):
+        self.words = text.split()
+        self.lexicon = lexicon
+        # map/compress keep the per-word membership test out of the interpreter loop
+        hits = list(compress(count(), map(lexicon.marked.__contains__, self.words)))
+        self.fillers = [index for index in hits if self.words[index] in lexicon.words]
+        self.phrase_starts = [index for index in hits if self.words[index] in lexicon.phrases_by_first]
+
+    def __len__(self):
+        return len(self.words)
+
+    def ngram_starts(self, size, anchor="first"):
+        """Start positions, in order, of the size-word windows that count as filler n-grams.
+
+        With anchor="first" the n-gram must start with a filler (communication1.py);
+        with anchor="any" any of its words may be a filler (app.py).
+        """
+        windows = len(self.words) - size + 1
+        if anchor == "first":
+            return [index for index in self.fillers if index < windows]
+        return sorted({index - offset for index in self.fillers for offset in range(size) if 0 <= index - offset < windows})
+
+# Counters below are filled in text order, so their keys are in order of first
+# occurrence and most_common breaks ties the way the original Counter code did
+
+def filler_word_counts(scanned):
+    words = scanned.words
+    return Counter(words[index] for index in scanned.fillers)
+
+def ngram_counts(scanned, size, anchor="first"):
+    words = scanned.words
+    return Counter(" ".join(words[index:index + size]) for index in scanned.ngram_starts(size, anchor))
+
+def phrase_counts(scanned):
+    words = scanned.words
+    counts = Counter()
+    phrases_by_first = scanned.lexicon.phrases_by_first
+    last = len(words) - 1
+    for index in scanned.phrase_starts:
+        if index == last:
+            continue
+        for phrase, joined in phrases_by_first[words[index]].get(words[index + 1], ()):
+            if len(phrase) == 2 or words[index:index + len(phrase)] == phrase:
+                counts[joined] += 1
+    return counts
+
+def filler_counts(text, lexicon=DEFAULT_LEXICON, anchor="first"):
+    """Full, mergeable counts of a text: every token, every filler, every filler 2/3-gram and lexicon phrase.
+
+    Each Counter lists its keys in order of first occurrence, so Counters of
+    consecutive texts merged with update() rank ties exactly like the counts
+    of the concatenated text would.
+    """
+    scanned = ScannedText(text, lexicon)
+    return {
+        "word_counts": Counter(scanned.words),
+        "filler_words": filler_word_counts(scanned),
+        "two_word_fillers": ngram_counts(scanned, 2, anchor),
+        "three_word_fillers": ngram_counts(scanned, 3, anchor),
+        "multi_word_fillers": phrase_counts(scanned),
+    }
+
+def analyze_fillers(text, lexicon=DEFAULT_LEXICON, top_n=5, anchor="first"):
+    """Splits and scans the text once and returns every filler statistic from that scan."""
+    scanned = ScannedText(text, lexicon)
+    return {
+        "unique_words": len(set(scanned.words)),
+        "filler_words": filler_word_counts(scanned).most_common(top_n),
+        "two_word_fillers": ngram_counts(scanned, 2, anchor).most_common(top_n),
+        "three_word_fillers": ngram_counts(scanned, 3, anchor).most_common(top_n),
+        "multi_word_fillers": phrase_counts(scanned).most_common(top_n),
+    }
+
+# Reference implementations the engine must agree with (the original Counter-based code)
+def _reference_fillers(text, top_n=5):
+    words = text.split()
+    return Counter(word for word in words if word in FILLER_WORDS).most_common(top_n)
+
+def _reference_filler_phrases(text, top_n=5):
+    words = text.split()
+    two_word_phrases = Counter(" ".join(words[i:i+2]) for i in range(len(words) - 1) if words[i] in FILLER_WORDS)
+    three_word_phrases = Counter(" ".join(words[i:i+3]) for i in range(len(words) - 2) if words[i] in FILLER_WORDS)
+    return two_word_phrases.most_common(top_n), three_word_phrases.most_common(top_n)
+
+def check_parity(folder="transcripts", repeat=5):
+    """Compares the engine with the original functions on every cached transcript and times both."""
+    from speech_analysis import preprocess_text
+    texts = {}
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        if path.endswith("_sponsorship.json"):
+            continue
+        with open(path, "r", encoding="utf-8") as file:
+            texts[os.path.basename(path)[:-5]] = preprocess_text(" ".join(entry["text"] for entry in json.load(file)))
+    texts["<corpus>"] = " ".join(texts.values())
+
+    mismatches = 0
+    for name, text in texts.items():
+        engine = analyze_fillers(text)
+        expected = (_reference_fillers(text),) + _reference_filler_phrases(text)
+        actual = (engine["filler_words"], engine["two_word_fillers"], engine["three_word_fillers"])
+        if actual != expected or engine["unique_words"] != len(set(text.split())):
+            mismatches += 1
+            print(f"MISMATCH {name}: {actual} != {expected}")
+    print(f"Parity: {len(texts) - mismatches}/{len(texts)} texts match")
+
+    largest = max(texts.values(), key=len)
+    for label, run in (
+        ("reference", lambda: (_reference_fillers(largest), _reference_filler_phrases(largest), len(set(largest.split())))),
+        ("engine", lambda: analyze_fillers(largest)),
+    ):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        print(f"{label}: {(time.perf_counter() - started) / repeat * 1000:.1f} ms on {len(largest.split())} words")
+    return mismatches == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_parity() else 1)
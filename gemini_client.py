@@ -0,0 +1,315 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from instrumentation import current_recorder, record_llm_call
+
+# Gemini quota for the project; defaults match the free tier of gemini-1.5-flash
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "15"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+
+# Use the local stub model instead of the Gemini API (e.g. GEMINI_STUB=1)
+GEMINI_STUB = os.getenv("GEMINI_STUB")
+
+# On-disk cache of Gemini responses; GEMINI_CACHE=0 bypasses it
+GEMINI_CACHE = os.getenv("GEMINI_CACHE", "1") != "0"
+GEMINI_CACHE_FOLDER = os.getenv("GEMINI_CACHE_FOLDER", "llm_cache")
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", str(7 * 24 * 3600)))
+GEMINI_CACHE_MAX_BYTES = int(os.getenv("GEMINI_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# Errors raised by the Gemini SDK when the quota is exhausted
+RATE_LIMIT_ERRORS = {"ResourceExhausted", "TooManyRequests", "StubRateLimitError"}
+
+def estimate_tokens(text):
+    """Rough token count for Gemini models (about four characters per token)."""
+    return len(text) // 4 + 1
+
+def is_rate_limited(error):
+    """Tells whether an error is a 429 / quota-exhausted response."""
+    return type(error).__name__ in RATE_LIMIT_ERRORS or "429" in str(error)
+
+class TokenBucket:
+    """Bucket holding up to `capacity` units, refilled at `capacity` per minute."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, scale=1.0):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity * scale / 60)
+        self.updated = now
+
+    def wait_time(self, amount, scale=1.0):
+        """Seconds until `amount` units are available (0 if they already are)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / (self.capacity * scale))
+
+class QuotaScheduler:
+    """Admits Gemini calls within requests-per-minute and tokens-per-minute budgets.
+
+    Calls run concurrently as long as both buckets have room. A 429 halves the
+    refill rate and pauses new calls briefly; each success restores a tenth of
+    the configured rate, so throughput settles just under the real quota.
+    """
+
+    def __init__(self, requests_per_minute=GEMINI_RPM, tokens_per_minute=GEMINI_TPM,
+                 max_concurrency=GEMINI_MAX_CONCURRENCY, max_retries=5, min_scale=0.05):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.min_scale = min_scale
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Condition()
+
+    def acquire(self, tokens):
+        """Blocks until one request and `tokens` tokens fit in the budget, then spends them."""
+        with self._lock:
+            while True:
+                self.requests.refill(self.scale)
+                self.tokens.refill(self.scale)
+                wait = max(
+                    self.paused_until - time.monotonic(),
+                    self.requests.wait_time(1, self.scale),
+                    self.tokens.wait_time(tokens, self.scale),
+                )
+                if wait <= 0:
+                    self.requests.level -= 1
+                    self.tokens.level -= tokens
+                    return
+                self._lock.wait(wait)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Corrects the token bucket once the real usage of a call is known."""
+        with self._lock:
+            self.tokens.level -= actual_tokens - estimated_tokens
+
+    def succeeded(self):
+        with self._lock:
+            self.scale = min(1.0, self.scale + 0.1)
+
+    def throttled(self, attempt):
+        with self._lock:
+            self.scale = max(self.min_scale, self.scale / 2)
+            backoff = min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+            self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+            # The bucket over-counted what the API let through; drain it so we restart gently
+            self.requests.level = min(self.requests.level, 0)
+            self._lock.notify_all()
+
+    def generate(self, model, prompt, generation_config=None, response_tokens=512, stats=None):
+        """Runs model.generate_content within the quota, retrying on 429 responses.
+
+        If stats is a dict, the retries and the seconds spent waiting for quota are written to it.
+        """
+        estimated = estimate_tokens(prompt) + response_tokens
+        attempt = 0
+        stats = {} if stats is None else stats
+        stats.update(retries=0, queue_seconds=0.0)
+        with self._slots:
+            while True:
+                waited = time.perf_counter()
+                self.acquire(estimated)
+                stats["queue_seconds"] = round(stats["queue_seconds"] + time.perf_counter() - waited, 6)
+                try:
+                    response = model.generate_content(prompt, generation_config=generation_config)
+                except Exception as e:
+                    if not is_rate_limited(e) or attempt >= self.max_retries:
+                        raise
+                    self.throttled(attempt)
+                    attempt += 1
+                    stats["retries"] = attempt
+                    continue
+                usage = getattr(response, "usage_metadata", None)
+                if usage and getattr(usage, "total_token_count", None):
+                    self.settle(estimated, usage.total_token_count)
+                self.succeeded()
+                return response
+
+class TextResponse:
+    """Minimal response object exposing `.text`, as returned by the cache and the stub."""
+
+    def __init__(self, text):
+        self.text = text
+
+def _is_valid(text, validate):
+    if validate is None:
+        return True
+    try:
+        validate(text)
+    except Exception:
+        return False
+    return True
+
+class ResponseCache:
+    """Content-addressed cache of model responses with TTL and size-based eviction.
+
+    Entries are keyed by a hash of the model name, generation config and
+    prompt, so byte-identical requests are answered without an API call.
+    """
+
+    def __init__(self, folder=GEMINI_CACHE_FOLDER, ttl_seconds=GEMINI_CACHE_TTL, max_bytes=GEMINI_CACHE_MAX_BYTES):
+        self.folder = folder
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.stores = self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name, generation_config, prompt):
+        payload = json.dumps([model_name, generation_config or {}, prompt], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, key, validate=None):
+        """Returns the cached response text, or None on a miss, an expired entry or one validate rejects."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            self._count("misses")
+            return None
+        if time.time() - entry["created"] > self.ttl_seconds or not _is_valid(entry["text"], validate):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._count("evictions")
+            self._count("misses")
+            return None
+        # Touch the entry so size-based eviction drops the least recently used first;
+        # another process may have evicted it since it was read, which counts as a miss
+        try:
+            os.utime(path)
+        except OSError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return entry["text"]
+
+    def put(self, key, model_name, text):
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"model": model_name, "created": time.time(), "text": text}, file)
+        os.replace(tmp_path, path)
+        self._count("stores")
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the folder fits in max_bytes."""
+        files = []
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            if name.endswith(".json") and os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._count("evictions")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits, "misses": self.misses, "stores": self.stores, "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+response_cache = ResponseCache()
+
+def model_name_of(model):
+    return getattr(model, "model_name", type(model).__name__)
+
+def generate(model, prompt, generation_config=None, scheduler=None, use_cache=GEMINI_CACHE, validate=None):
+    """Single entry point for Gemini calls: answers from the response cache when it
+    can, otherwise calls the model (through the quota scheduler if one is given)
+    and caches the text of the response.
+
+    validate(text) should raise when the caller cannot use a response: such
+    responses are not cached, and cached ones are dropped and asked again.
+    """
+    model_name = model_name_of(model)
+    key = ResponseCache.key(model_name, generation_config, prompt)
+    started = time.perf_counter()
+    if use_cache:
+        text = response_cache.get(key, validate)
+        if text is not None:
+            record_llm_call(model=model_name, cache="hit", seconds=round(time.perf_counter() - started, 6),
+                            prompt_chars=len(prompt), response_chars=len(text), retries=0)
+            return TextResponse(text)
+    stats = {}
+    try:
+        if scheduler:
+            response = scheduler.generate(model, prompt, generation_config=generation_config, stats=stats)
+        else:
+            response = model.generate_content(prompt, generation_config=generation_config)
+    except Exception as e:
+        record_llm_call(model=model_name, cache="miss" if use_cache else "off", seconds=round(time.perf_counter() - started, 6),
+                        prompt_chars=len(prompt), response_chars=0, error=type(e).__name__, **stats)
+        raise
+    if current_recorder().enabled:
+        usage = getattr(response, "usage_metadata", None)
+        record_llm_call(model=model_name, cache="miss" if use_cache else "off", seconds=round(time.perf_counter() - started, 6),
+                        prompt_chars=len(prompt), response_chars=len(response.text or "") if response else 0,
+                        total_tokens=getattr(usage, "total_token_count", None), **stats)
+    if use_cache and response and response.text and _is_valid(response.text, validate):
+        response_cache.put(key, model_name, response.text)
+    return response
+
+class StubRateLimitError(Exception):
+    """429 raised by StubModel when it is called faster than its own quota."""
+
+class StubModel:
+    """Local stand-in for genai.GenerativeModel used to exercise the scheduler offline.
+
+    Replies with `reply(prompt)` after `latency` seconds and raises a 429 once
+    more than `requests_per_minute` calls land within a rolling minute.
+    """
+
+    def __init__(self, model_name="stub", reply=None, latency=0.05, requests_per_minute=None):
+        self.model_name = model_name
+        self.reply = reply or (lambda prompt: '{"advertisement_text": "No Advertisement Found"}')
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None):
+        with self._lock:
+            now = time.monotonic()
+            self.calls = [call for call in self.calls if now - call < 60]
+            if self.requests_per_minute and len(self.calls) >= self.requests_per_minute:
+                raise StubRateLimitError("429 Resource has been exhausted (stub quota)")
+            self.calls.append(now)
+        time.sleep(self.latency)
+        return TextResponse(self.reply(prompt))
+
+def get_model(model_name):
+    """Returns the Gemini model, or the local stub when GEMINI_STUB is set."""
+    if GEMINI_STUB:
+        return StubModel(model_name)
+    import google.generativeai as genai
+    return genai.GenerativeModel(model_name)
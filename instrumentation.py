@@ -0,0 +1,182 @@
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# INSTRUMENTATION=1 records timing spans and Gemini calls; when off, span() returns a shared no-op
+INSTRUMENTATION = os.getenv("INSTRUMENTATION", "0") != "0"
+
+# Records are logged as JSON lines to the "communication_analysis" logger, and to this file if set
+INSTRUMENTATION_LOG = os.getenv("INSTRUMENTATION_LOG")
+
+# Most recent records kept in memory for the dashboard's debug panel
+MAX_RECORDS = int(os.getenv("INSTRUMENTATION_MAX_RECORDS", "5000"))
+
+logger = logging.getLogger("communication_analysis")
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **fields):
+        pass
+
+NO_SPAN = _NoSpan()
+
+class Span:
+    """Times a block; nested spans on the same thread record their parent."""
+
+    def __init__(self, recorder, name, fields):
+        self.recorder = recorder
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        """Adds fields known only inside the block (sizes, cache hits, attempts)."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        stack = self.recorder._stack()
+        self.parent = stack[-1].name if stack else None
+        self.depth = len(stack)
+        stack.append(self)
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.started
+        self.recorder._stack().pop()
+        record = {"type": "span", "name": self.name, "seconds": round(seconds, 6), "parent": self.parent,
+                  "depth": self.depth, "thread": threading.current_thread().name, "at": round(self.started_at, 3)}
+        record.update(self.fields)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        self.recorder.emit(record)
+        return False
+
+class Recorder:
+    """Collects spans and LLM call records: kept in a bounded buffer and written as structured logs."""
+
+    def __init__(self, enabled=INSTRUMENTATION, log_path=INSTRUMENTATION_LOG, max_records=MAX_RECORDS):
+        self.enabled = enabled
+        self._records = deque(maxlen=max_records)
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if log_path and not any(getattr(handler, "baseFilename", None) == os.path.abspath(log_path) for handler in logger.handlers):
+            handler = logging.FileHandler(log_path, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **fields):
+        return Span(self, name, fields) if self.enabled else NO_SPAN
+
+    def llm_call(self, **fields):
+        if self.enabled:
+            self.emit({"type": "llm", "thread": threading.current_thread().name, "at": round(time.time(), 3), **fields})
+
+    def emit(self, record):
+        with self._lock:
+            record["seq"] = next(self._sequence)
+            self._records.append(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record, default=str))
+
+    def mark(self):
+        """Sequence number of the latest record; pass it to records() to get only what came after."""
+        with self._lock:
+            return self._records[-1]["seq"] if self._records else 0
+
+    def records(self, kind=None, since=0):
+        with self._lock:
+            records = list(self._records)
+        return [record for record in records if record["seq"] > since and (kind is None or record["type"] == kind)]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+recorder = Recorder()
+
+# Recorder of the current context (e.g. one dashboard session's run); the process-wide one when unset
+_active = contextvars.ContextVar("recorder", default=None)
+
+def current_recorder():
+    return _active.get() or recorder
+
+def use_recorder(run_recorder):
+    """Sends this context's spans and LLM calls to run_recorder (None: back to the process-wide recorder)."""
+    _active.set(run_recorder)
+
+def in_context(function):
+    """function bound to a copy of the caller's context, so worker threads record where the caller does."""
+    return functools.partial(contextvars.copy_context().run, function)
+
+def span(name, **fields):
+    """Context manager timing a stage: with span("parse", video_id=...) as s: ... s.set(chunks=len(chunks))."""
+    return current_recorder().span(name, **fields)
+
+def timed(name):
+    """Decorator recording every call of a function as a span called name."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            active = current_recorder()
+            if not active.enabled:
+                return function(*args, **kwargs)
+            with active.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def record_llm_call(**fields):
+    """One Gemini call: model, seconds, prompt/response characters, retries, cache "hit"/"miss", error."""
+    current_recorder().llm_call(**fields)
+
+def set_enabled(enabled=True):
+    recorder.enabled = enabled
+
+def span_summary(records):
+    """Per span name: calls, total/mean/max seconds and errors, slowest total first."""
+    stages = {}
+    for record in records:
+        if record["type"] != "span":
+            continue
+        stage = stages.setdefault(record["name"], {"stage": record["name"], "calls": 0, "total_seconds": 0.0,
+                                                   "max_seconds": 0.0, "errors": 0})
+        stage["calls"] += 1
+        stage["total_seconds"] += record["seconds"]
+        stage["max_seconds"] = max(stage["max_seconds"], record["seconds"])
+        stage["errors"] += "error" in record
+    for stage in stages.values():
+        stage["mean_seconds"] = stage["total_seconds"] / stage["calls"]
+    return sorted(stages.values(), key=lambda stage: stage["total_seconds"], reverse=True)
+
+def llm_summary(records):
+    """Totals over LLM call records: calls, cache hits, retries, errors, seconds and characters sent and received."""
+    calls = [record for record in records if record["type"] == "llm"]
+    return {
+        "calls": len(calls),
+        "cache_hits": sum(1 for call in calls if call.get("cache") == "hit"),
+        "retries": sum(call.get("retries", 0) for call in calls),
+        "errors": sum(1 for call in calls if call.get("error")),
+        "seconds": round(sum(call.get("seconds", 0) for call in calls), 3),
+        "prompt_chars": sum(call.get("prompt_chars", 0) for call in calls),
+        "response_chars": sum(call.get("response_chars", 0) for call in calls),
+    }
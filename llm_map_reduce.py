@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from gemini_client import estimate_tokens, generate
+from instrumentation import in_context
+
+# Largest transcript chunk sent in a single map call
+CHUNK_TOKENS = int(os.getenv("GEMINI_CHUNK_TOKENS", "8000"))
+
+def split_long_entry(entry, max_tokens):
+    """Splits an entry that alone exceeds the budget on word boundaries."""
+    pieces, words, size = [], [], 0
+    for word in entry.split():
+        cost = estimate_tokens(word + " ")
+        if words and size + cost > max_tokens:
+            pieces.append(" ".join(words))
+            words, size = [], 0
+        words.append(word)
+        size += cost
+    if words:
+        pieces.append(" ".join(words))
+    return pieces
+
+def chunk_by_tokens(entries, max_tokens=CHUNK_TOKENS):
+    """Groups consecutive transcript entries into chunks of at most max_tokens, never splitting an entry
+    unless it is larger than the budget on its own."""
+    chunks, current, size = [], [], 0
+    for entry in entries:
+        pieces = split_long_entry(entry, max_tokens) if estimate_tokens(entry) > max_tokens else [entry]
+        for piece in pieces:
+            cost = estimate_tokens(piece)
+            if current and size + cost > max_tokens:
+                chunks.append(" ".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += cost
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def map_reduce(model, entries, map_prompt, reduce_prompt, direct_prompt=None, generation_config=None,
+               scheduler=None, max_tokens=CHUNK_TOKENS, max_workers=8, on_map_result=None):
+    """Analyzes a long transcript as concurrent chunk calls merged by one reduce call.
+
+    map_prompt(chunk, index, total) and reduce_prompt(findings) build the
+    prompts. When the whole transcript fits in one chunk, direct_prompt(text)
+    is sent as a single call instead. Every call goes through generate, so
+    unchanged chunks are answered from the response cache. on_map_result(index,
+    total, text) is called as each chunk finishes, in completion order.
+    """
+    chunks = chunk_by_tokens(entries, max_tokens)
+    if not chunks:
+        return ""
+    if len(chunks) == 1 and direct_prompt:
+        return generate(model, direct_prompt(chunks[0]), generation_config, scheduler=scheduler).text
+
+    findings = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        futures = {
+            executor.submit(in_context(generate), model, map_prompt(chunk, index, len(chunks)), generation_config, scheduler): index
+            for index, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            findings[index] = future.result().text
+            if on_map_result:
+                on_map_result(index, len(chunks), findings[index])
+    return generate(model, reduce_prompt(findings), generation_config, scheduler=scheduler).text
@@ -0,0 +1,131 @@
+import importlib.metadata
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# spaCy pipeline used by the analyses
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+
+# Components of the spaCy model; the ones an analysis does not need are not even loaded
+MODEL_COMPONENTS = ("tok2vec", "tagger", "parser", "senter", "attribute_ruler", "lemmatizer", "ner")
+
+# Import time the analysis library should stay under
+STARTUP_TARGET_SECONDS = 1.0
+
+class ModelRegistry:
+    """Process-wide spaCy pipelines and Gemini models, each loaded on first use.
+
+    A pipeline is loaded with only the components asked for and reused for
+    any later request it covers, so counting words never loads the tagger and
+    importing a helper loads nothing at all.
+    """
+
+    def __init__(self, spacy_model=SPACY_MODEL):
+        self.spacy_model = spacy_model
+        self._pipelines = []
+        self._gemini_models = {}
+        self._configured_keys = set()
+        self._lock = threading.RLock()
+
+    def nlp(self, components=None):
+        """spaCy pipeline with at least the given components (all of them when None)."""
+        with self._lock:
+            for loaded, pipeline in self._pipelines:
+                if loaded is None or (components is not None and loaded >= set(components)):
+                    return pipeline
+            import spacy
+            if components is None:
+                pipeline, loaded = spacy.load(self.spacy_model), None
+            else:
+                loaded = set(components)
+                pipeline = spacy.load(self.spacy_model, exclude=[name for name in MODEL_COMPONENTS if name not in loaded])
+            self._pipelines.append((loaded, pipeline))
+            return pipeline
+
+    def spacy_signature(self):
+        """lang_name-version of the spaCy model, read from its package metadata without loading it."""
+        try:
+            return f"{self.spacy_model}-{importlib.metadata.version(self.spacy_model)}"
+        except importlib.metadata.PackageNotFoundError:
+            meta = self.nlp(()).meta
+            return f"{meta['lang']}_{meta['name']}-{meta['version']}"
+
+    def gemini(self, model_name, api_key_env="GEMINI_API_KEY"):
+        """Gemini model, configuring the SDK with the key in api_key_env the first time."""
+        from gemini_client import GEMINI_STUB, get_model
+        with self._lock:
+            if not GEMINI_STUB and api_key_env not in self._configured_keys:
+                api_key = os.getenv(api_key_env)
+                if not api_key:
+                    raise ValueError(f"❌ API key missing! Set {api_key_env} in environment variables.")
+                import google.generativeai as genai
+                genai.configure(api_key=api_key)
+                self._configured_keys.add(api_key_env)
+            if model_name not in self._gemini_models:
+                self._gemini_models[model_name] = get_model(model_name)
+            return self._gemini_models[model_name]
+
+    def loaded(self):
+        """Names of what has been loaded so far, for diagnostics."""
+        with self._lock:
+            pipelines = [f"{self.spacy_model}[{','.join(pipeline.pipe_names) or 'tokenizer'}]" for _, pipeline in self._pipelines]
+            return pipelines + list(self._gemini_models)
+
+_registry = ModelRegistry()
+
+def get_registry():
+    return _registry
+
+def use_registry(registry):
+    """Replaces the process-wide registry, e.g. with one cached by st.cache_resource
+    so the models survive Streamlit reloading this module."""
+    global _registry
+    _registry = registry
+
+def get_nlp(components=None):
+    return _registry.nlp(components)
+
+def get_gemini(model_name, api_key_env="GEMINI_API_KEY"):
+    return _registry.gemini(model_name, api_key_env)
+
+# Entry points and helper modules timed by the startup benchmark
+STARTUP_MODULES = ("speech_analysis", "analysis_cache", "speech_timeline", "aggregate_store", "app", "app3", "app4")
+
+def import_seconds(module, repeat=3):
+    """Best cold-import time of a module, each run in a fresh interpreter, or the import error."""
+    script = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode:
+            return result.stderr.strip().splitlines()[-1]
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+def startup_benchmark(modules=STARTUP_MODULES, target_seconds=STARTUP_TARGET_SECONDS):
+    """Times the cold import of each module and the first load of each metric's pipeline."""
+    print(f"Cold import (target < {target_seconds:.1f} s for the analysis library):")
+    for module in modules:
+        seconds = import_seconds(module)
+        if isinstance(seconds, str):
+            print(f"  ⚠️ {module}: {seconds}")
+        else:
+            print(f"  {'✅' if seconds < target_seconds else '❌'} {module}: {seconds * 1000:.0f} ms")
+
+    from speech_analysis import METRIC_COMPONENTS
+    print("First use of each metric's pipeline:")
+    for metric, components in METRIC_COMPONENTS.items():
+        registry = ModelRegistry()
+        started = time.perf_counter()
+        try:
+            registry.nlp(components)
+        except OSError as error:
+            print(f"  ⚠️ {metric}: {error}")
+            continue
+        print(f"  {metric}: {(time.perf_counter() - started) * 1000:.0f} ms ({', '.join(registry.loaded())})")
+
+if __name__ == "__main__":
+    startup_benchmark()
@@ -0,0 +1,177 @@
+import glob
+import json
+import os
+import sys
+import time
+import numpy as np
+
+# Words that flip the polarity of the next sentiment word, as in TextBlob
+NEGATIONS = {"no", "not", "n't", "never"}
+
+class PolarityLexicon:
+    """TextBlob's pattern polarity lexicon, loaded once and looked up by token ID.
+
+    Each word has a polarity, a subjectivity and an intensity; adverbs ("RB")
+    can modify the next sentiment word ("very good").
+    """
+
+    def __init__(self):
+        from textblob.en import sentiment
+        if not dict.__len__(sentiment):
+            sentiment.load()
+        self.entries = {
+            word: (senses[None][0], senses[None][2], "RB" in senses)
+            for word, senses in dict.items(sentiment) if None in senses
+        }
+
+    def table(self, vocabulary):
+        """Per-vocabulary-ID arrays: known, polarity, intensity, is_adverb, is_negation, ends_with_ly,
+        and the two word-length tests TextBlob uses to forget a pending negation or modifier."""
+        columns = [self.entries.get(word, (0.0, 1.0, False)) for word in vocabulary]
+        polarity, intensity, adverb = (np.array(column) for column in zip(*columns)) if columns else ([],) * 3
+        return {
+            "known": np.array([word in self.entries for word in vocabulary], dtype=bool),
+            "polarity": np.asarray(polarity, dtype=np.float64),
+            "intensity": np.asarray(intensity, dtype=np.float64),
+            "adverb": np.asarray(adverb, dtype=bool),
+            "negation": np.array([word in NEGATIONS for word in vocabulary], dtype=bool),
+            "ly": np.array([word.endswith("ly") for word in vocabulary], dtype=bool),
+            "long1": np.array([len(word.strip("'")) > 1 for word in vocabulary], dtype=bool),
+            "long2": np.array([len(word) > 2 for word in vocabulary], dtype=bool),
+        }
+
+_lexicon = None
+
+def default_lexicon():
+    global _lexicon
+    if _lexicon is None:
+        _lexicon = PolarityLexicon()
+    return _lexicon
+
+def _chunk_scores(ids, segment_of, table):
+    """Replays TextBlob's modifier/negation rules over the token stream.
+
+    Only sentiment words and negations start a step; the words between them
+    are looked at only while a modifier or negation is still pending, which
+    is rarely more than one word. Returns the segment and final polarity of
+    every assessed chunk ("good", "very good", "not very good", ...).
+    """
+    known, negation = table["known"][ids], table["negation"][ids]
+    events = np.flatnonzero(known | negation).tolist()
+    ids, segment_of = ids.tolist(), segment_of.tolist()
+    polarity, intensity, adverb = table["polarity"].tolist(), table["intensity"].tolist(), table["adverb"].tolist()
+    is_negation, ly, long1, long2 = (table[name].tolist() for name in ("negation", "ly", "long1", "long2"))
+
+    chunk_segments, chunk_polarity = [], []
+    chunk_intensity = chunk_negated = 0
+    modifier = negated = None  # Token IDs of the pending modifier and negation
+    segment = -1
+    for position, event in enumerate(events):
+        if segment_of[event] != segment:
+            segment = segment_of[event]
+            modifier = negated = None
+        token = ids[event]
+        if is_negation[token]:
+            negated = token
+            if modifier is not None and ly[modifier]:
+                chunk_negated, negated = True, None
+            elif modifier is not None and long2[token]:
+                modifier = None
+        else:
+            p, i = polarity[token], intensity[token]
+            if modifier is None:
+                if chunk_segments:
+                    chunk_polarity[-1] = chunk_polarity[-1] * -0.5 if chunk_negated else chunk_polarity[-1]
+                chunk_segments.append(segment)
+                chunk_polarity.append(p)
+                chunk_intensity, chunk_negated = i, False
+            else:
+                chunk_polarity[-1] = max(-1.0, min(p * chunk_intensity, 1.0))
+                chunk_intensity = i
+            if negated is not None:
+                chunk_intensity, chunk_negated = 1.0 / chunk_intensity, True
+            modifier = token if adverb[token] else None
+            negated = None
+        # Walk the unknown words up to the next event only while something is pending
+        if modifier is None and negated is None:
+            continue
+        stop = events[position + 1] if position + 1 < len(events) else len(ids)
+        for index in range(event + 1, stop):
+            if segment_of[index] != segment:
+                break
+            word = ids[index]
+            if negated is not None and long1[word]:
+                negated = None
+            if negated is not None and modifier is not None and ly[modifier]:
+                chunk_negated, negated = True, None
+            elif modifier is not None and long2[word]:
+                modifier = None
+            if modifier is None and negated is None:
+                break
+    if chunk_segments and chunk_negated:
+        chunk_polarity[-1] *= -0.5
+    return np.array(chunk_segments, dtype=np.int64), np.array(chunk_polarity, dtype=np.float64)
+
+def score_segments(segments, lexicon=None):
+    """Polarity of every segment (sentence or caption) of preprocessed text, equal to
+    TextBlob(segment).sentiment.polarity, computed in one batch over all segments."""
+    lexicon = lexicon or default_lexicon()
+    words = [segment.split() for segment in segments]
+    lengths = np.fromiter((len(tokens) for tokens in words), dtype=np.int64, count=len(words))
+    if not lengths.sum():
+        return np.zeros(len(segments))
+    # pandas is only needed here, so importing the analysis modules does not pay for it
+    import pandas as pd
+    tokens = np.array([token for tokens in words for token in tokens], dtype=object)
+    codes, vocabulary = pd.factorize(tokens, sort=False)
+    segment_of = np.repeat(np.arange(len(segments)), lengths)
+    chunk_segments, chunk_polarity = _chunk_scores(codes.astype(np.int64), segment_of, lexicon.table(list(vocabulary)))
+    totals = np.bincount(chunk_segments, weights=chunk_polarity, minlength=len(segments))
+    chunks = np.bincount(chunk_segments, minlength=len(segments))
+    return totals / np.maximum(chunks, 1)
+
+def score_totals(scores):
+    """Mergeable totals (see speech_analysis.sentiment_totals) straight from the score array."""
+    return {
+        "positive": int((scores > 0).sum()),
+        "neutral": int((scores == 0).sum()),
+        "negative": int((scores < 0).sum()),
+        "score_sum": sum(scores.tolist()),
+    }
+
+def top_segments(segments, scores, top_n=2):
+    """(most_positive, most_negative) as (segment, score) lists, ordered like sorting by score."""
+    order = np.argsort(scores, kind="stable")
+    pick = lambda indices: [(segments[i], float(scores[i])) for i in indices]
+    return pick(order[len(order) - top_n:] if top_n else []), pick(order[:top_n])
+
+# Reference implementation the engine must agree with
+def _reference_scores(segments):
+    from textblob import TextBlob
+    return [TextBlob(segment).sentiment.polarity for segment in segments]
+
+def check_parity(folder="transcripts", repeat=3):
+    """Scores every cached transcript's captions with the engine and with TextBlob, and times both."""
+    from speech_analysis import preprocess_text
+    segments = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        if path.endswith("_sponsorship.json"):
+            continue
+        with open(path, "r", encoding="utf-8") as file:
+            segments.extend(preprocess_text(entry["text"]) for entry in json.load(file))
+
+    started = time.perf_counter()
+    expected = _reference_scores(segments)
+    reference_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(repeat):
+        scores = score_segments(segments)
+    engine_seconds = (time.perf_counter() - started) / repeat
+
+    mismatches = sum(1 for actual, wanted in zip(scores.tolist(), expected) if abs(actual - wanted) > 1e-9)
+    print(f"Parity: {len(segments) - mismatches}/{len(segments)} segments match")
+    print(f"TextBlob: {reference_seconds * 1000:.0f} ms, engine: {engine_seconds * 1000:.0f} ms")
+    return mismatches == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_parity() else 1)
@@ -0,0 +1,153 @@
+import datetime
+import heapq
+import json
+import random
+import sys
+import time
+from instrumentation import timed
+
+# A segment that overlaps no turn goes to the nearest turn within this many seconds, else to no speaker
+MAX_GAP_SECONDS = 1.0
+
+def format_time(seconds):
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+def diarization_turns(diarization):
+    """(start, end, speaker) tuples of a pyannote diarization, sorted by start."""
+    return sorted((turn.start, turn.end, speaker) for turn, _, speaker in diarization.itertracks(yield_label=True))
+
+@timed("speaker_alignment")
+def align_segments(turns, segments, max_gap=MAX_GAP_SECONDS):
+    """Assigns every transcription segment to the speaker turn it overlaps most.
+
+    turns are (start, end, speaker) tuples and segments are Whisper-style
+    {"start", "end", "text"} dicts, both in any order. One sweep over both
+    in start order keeps a heap of the turns still open at the current
+    segment, so the cost is O((turns + segments) log turns) instead of
+    turns x segments. Ties go to the turn that starts first. Returns one
+    {"start", "end", "text", "speaker", "overlap"} record per segment, in start order.
+    """
+    turns = sorted(turns)
+    records = []
+    active = []  # (end, index) of turns that started before the current segment ends
+    next_turn = 0
+    last_ended = None  # Index of the latest-ending turn already closed, for the nearest-turn fallback
+    for segment in sorted(segments, key=lambda segment: (segment["start"], segment["end"])):
+        start, end = segment["start"], segment["end"]
+        while next_turn < len(turns) and turns[next_turn][0] < end:
+            heapq.heappush(active, (turns[next_turn][1], next_turn))
+            next_turn += 1
+        while active and active[0][0] <= start:
+            _, index = heapq.heappop(active)
+            if last_ended is None or (turns[index][1], -index) > (turns[last_ended][1], -last_ended):
+                last_ended = index
+        best, best_overlap = None, 0.0
+        for turn_end, index in active:
+            overlap = min(end, turn_end) - max(start, turns[index][0])
+            if overlap > best_overlap or (overlap == best_overlap and best is not None and index < best):
+                best, best_overlap = index, overlap
+        if best is None:
+            best = _nearest_turn(turns, [index for _, index in active], last_ended, next_turn, start, end, max_gap)
+        records.append({
+            "start": start, "end": end, "text": segment["text"].strip(),
+            "speaker": turns[best][2] if best is not None else None, "overlap": round(max(best_overlap, 0.0), 3),
+        })
+    return records
+
+def _nearest_turn(turns, active, before, after, start, end, max_gap):
+    # Closest turn, if within max_gap: an open one (only zero-length segments overlap nothing
+    # while turns are open), the latest one that ended before the segment, or the next one to start
+    candidates = [(max(turns[index][0] - end, start - turns[index][1]), index) for index in active]
+    if before is not None:
+        candidates.append((start - turns[before][1], before))
+    if after < len(turns):
+        candidates.append((turns[after][0] - end, after))
+    gap, index = min(candidates, default=(None, None))
+    return index if gap is not None and gap <= max_gap else None
+
+def speaker_turns(records):
+    """Merges consecutive records of the same speaker into {"speaker", "start", "end", "text", "segments"}."""
+    merged = []
+    for record in records:
+        if merged and merged[-1]["speaker"] == record["speaker"]:
+            current = merged[-1]
+            current["end"] = max(current["end"], record["end"])
+            current["texts"].append(record["text"])
+        else:
+            merged.append({"speaker": record["speaker"], "start": record["start"], "end": record["end"], "texts": [record["text"]]})
+    return [
+        {"speaker": turn["speaker"], "start": turn["start"], "end": turn["end"],
+         "text": " ".join(text for text in turn["texts"] if text), "segments": len(turn["texts"])}
+        for turn in merged
+    ]
+
+def write_transcript(turns, path="speaker_transcript.txt"):
+    """Writes speaker turns in the notebook's "SPEAKER start --> end" text format."""
+    with open(path, "w", encoding="utf-8") as file:
+        for turn in turns:
+            file.write(f"{turn['speaker'] or 'UNKNOWN'} {format_time(turn['start'])} --> {format_time(turn['end'])}\n{turn['text']}\n\n")
+
+def write_jsonl(records, path):
+    with open(path, "w", encoding="utf-8") as file:
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+
+# Reference: maximum-overlap assignment by checking every turn for every segment
+def _reference_speakers(turns, segments, max_gap=MAX_GAP_SECONDS):
+    turns = sorted(turns)
+    speakers = []
+    for segment in sorted(segments, key=lambda segment: (segment["start"], segment["end"])):
+        overlaps = [min(segment["end"], end) - max(segment["start"], start) for start, end, _ in turns]
+        best = max(range(len(turns)), key=lambda index: (overlaps[index], -index), default=None)
+        if best is None or overlaps[best] <= 0:
+            gaps = [(max(start - segment["end"], segment["start"] - end), index) for index, (start, end, _) in enumerate(turns)]
+            gap, best = min(gaps, default=(None, None))
+            best = best if gap is not None and gap <= max_gap else None
+        speakers.append(turns[best][2] if best is not None else None)
+    return speakers
+
+# The notebook's original loop: text goes to every turn whose span contains the segment start
+def _notebook_transcript(turns, segments):
+    transcript_data = []
+    for start, end, speaker in turns:
+        transcript_text = ""
+        for seg in segments:
+            if start <= seg["start"] <= end:
+                transcript_text += seg["text"] + " "
+        transcript_data.append((speaker, format_time(start), format_time(end), transcript_text.strip()))
+    return transcript_data
+
+def synthetic_recording(hours=1.0, speakers=4, seed=0):
+    """Panel-like turns (with some overlapping speech) and Whisper-like segments that straddle them."""
+    rng = random.Random(seed)
+    turns, clock = [], 0.0
+    while clock < hours * 3600:
+        length = rng.uniform(1.0, 40.0)
+        turns.append((clock, clock + length, f"SPEAKER_{rng.randrange(speakers):02d}"))
+        clock += length + rng.uniform(-0.8, 1.5)
+    segments, clock = [], 0.0
+    while clock < hours * 3600:
+        length = rng.uniform(1.5, 8.0)
+        segments.append({"start": clock, "end": clock + length, "text": f" words {len(segments)}"})
+        clock += length + rng.uniform(0.0, 0.6)
+    return turns, segments
+
+def check_alignment(hours=(0.5, 3.0), seed=0):
+    """Compares align_segments with the brute-force assignment and times it against the notebook loop."""
+    ok = True
+    for length in hours:
+        turns, segments = synthetic_recording(length, seed=seed)
+        started = time.perf_counter()
+        records = align_segments(turns, segments)
+        sweep_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        _notebook_transcript(turns, segments)
+        notebook_seconds = time.perf_counter() - started
+        mismatches = sum(1 for record, speaker in zip(records, _reference_speakers(turns, segments)) if record["speaker"] != speaker)
+        ok = ok and mismatches == 0
+        print(f"{length:g} h, {len(turns)} turns x {len(segments)} segments: {len(segments) - mismatches}/{len(segments)} "
+              f"match brute force; sweep {sweep_seconds * 1000:.0f} ms, notebook loop {notebook_seconds * 1000:.0f} ms")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if check_alignment() else 1)
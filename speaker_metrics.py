@@ -0,0 +1,155 @@
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+import numpy as np
+import pandas as pd
+from filler_engine import FILLER_WORDS
+from instrumentation import timed
+from sentiment_engine import score_segments
+from speaker_alignment import speaker_turns
+from speech_analysis import (categorize_sentiment_totals, count_docs, pipe_docs, preprocess_texts,
+                             speech_rates, summarize_counts, word_alpha_counts)
+
+# Label for segments that no diarization turn claimed
+UNKNOWN_SPEAKER = "UNKNOWN"
+
+@timed("speaker_metrics")
+def speaker_metrics(records, top_n=5):
+    """Pace, filler %, vocabulary and sentiment of every speaker of a diarized transcript.
+
+    records are speaker-labeled segments ({"start", "end", "text", "speaker"},
+    as returned by speaker_alignment.align_segments). All speakers are scored
+    in one pass: words are encoded once and every per-speaker total is a
+    bincount over the speaker of each word or segment. Words are counted as
+    speech_analysis counts them: total_words as count_words would over the
+    speaker's parsed text, unique_words as the distinct words of their text
+    (see summarize_counts). Speaking time is the
+    sum of each speaker's turn durations, so pace is words per minute of that
+    speaker's own turns. Returns one row per speaker, most speaking time first.
+    """
+    records = [{**record, "speaker": record["speaker"] or UNKNOWN_SPEAKER} for record in records]
+    if not records:
+        return []
+    segment_speakers, speakers = pd.factorize(np.array([record["speaker"] for record in records], dtype=object))
+    speaker_count = len(speakers)
+
+    turns = speaker_turns(records)
+    turn_speakers = pd.Index(speakers).get_indexer([turn["speaker"] for turn in turns])
+    speaking = np.bincount(turn_speakers, weights=[turn["end"] - turn["start"] for turn in turns], minlength=speaker_count)
+    turn_counts = np.bincount(turn_speakers, minlength=speaker_count)
+
+    # Every word of every segment, tagged with its speaker
+    texts = preprocess_texts([record["text"] for record in records])
+    words = [text.split() for text in texts]
+    lengths = np.fromiter((len(tokens) for tokens in words), dtype=np.int64, count=len(words))
+    word_ids, vocabulary = pd.factorize(np.array([token for tokens in words for token in tokens], dtype=object))
+    vocabulary = list(vocabulary)
+    word_speakers = np.repeat(segment_speakers, lengths)
+    # Each distinct word is tokenized once; its alpha tokens count for every use of it
+    alpha_counts = np.array(word_alpha_counts(vocabulary), dtype=np.int64)[word_ids] if vocabulary else np.zeros(0, dtype=np.int64)
+    filler = np.array([word in FILLER_WORDS for word in vocabulary], dtype=bool)[word_ids] if vocabulary else np.zeros(0, dtype=bool)
+
+    total_words = np.bincount(word_speakers, weights=alpha_counts, minlength=speaker_count).astype(np.int64)
+    pairs = word_speakers.astype(np.int64) * max(len(vocabulary), 1) + word_ids
+    unique_words = np.bincount(np.unique(pairs) // max(len(vocabulary), 1), minlength=speaker_count)
+
+    # Filler counts per speaker, in order of first occurrence so ties rank like Counter.most_common
+    filler_keys = word_speakers[filler].astype(np.int64) * max(len(vocabulary), 1) + word_ids[filler]
+    fillers = [Counter() for _ in range(speaker_count)]
+    if len(filler_keys):
+        keys, first, counts = np.unique(filler_keys, return_index=True, return_counts=True)
+        for index in np.argsort(first):
+            speaker, word = divmod(int(keys[index]), max(len(vocabulary), 1))
+            fillers[speaker][vocabulary[word]] = int(counts[index])
+
+    # Segments left empty by preprocessing are not scored, as in count_docs
+    scored = lengths > 0
+    scores = score_segments([text for text, keep in zip(texts, scored) if keep])
+    scored_speakers = segment_speakers[scored]
+    positive = np.bincount(scored_speakers, weights=scores > 0, minlength=speaker_count)
+    neutral = np.bincount(scored_speakers, weights=scores == 0, minlength=speaker_count)
+    negative = np.bincount(scored_speakers, weights=scores < 0, minlength=speaker_count)
+    score_sum = np.bincount(scored_speakers, weights=scores, minlength=speaker_count)
+
+    total_speaking = speaking.sum()
+    rows = []
+    for index, speaker in enumerate(speakers):
+        filler_percentage, speaking_pace = speech_rates(int(total_words[index]), float(speaking[index]), fillers[index])
+        sentiment_totals = {"positive": int(positive[index]), "neutral": int(neutral[index]),
+                            "negative": int(negative[index]), "score_sum": float(score_sum[index])}
+        sentiment = categorize_sentiment_totals(sentiment_totals)
+        rows.append({
+            "speaker": speaker,
+            "turns": int(turn_counts[index]),
+            "speaking_seconds": round(float(speaking[index]), 2),
+            "share_of_time": round(float(speaking[index] / total_speaking * 100), 2) if total_speaking > 0 else 0,
+            "total_words": int(total_words[index]),
+            "unique_words": int(unique_words[index]),
+            "speaking_pace": speaking_pace,
+            "filler_percentage": filler_percentage,
+            "filler_words": fillers[index].most_common(top_n),
+            "sentiment_totals": sentiment_totals,
+            "overall_sentiment": round(sentiment["Overall Sentiment"], 4),
+            "sentiment_label": sentiment["Label"],
+        })
+    return sorted(rows, key=lambda row: row["speaking_seconds"], reverse=True)
+
+# Reference: the whole-video analysis (count_docs and summarize_counts) run once per speaker on that speaker's segments
+def _reference_metrics(records, metrics=("words", "fillers", "sentiment")):
+    rows = {}
+    for speaker in dict.fromkeys(record["speaker"] or UNKNOWN_SPEAKER for record in records):
+        own = [record["text"] for record in records if (record["speaker"] or UNKNOWN_SPEAKER) == speaker]
+        turns = [turn for turn in speaker_turns(records) if (turn["speaker"] or UNKNOWN_SPEAKER) == speaker]
+        # Segments are preprocessed one by one, as speaker_metrics does (joined captions can
+        # preprocess differently, e.g. contractions.fix expands a leading "cause")
+        chunks = [text for text in preprocess_texts(own) if text]
+        counts = count_docs(chunks, pipe_docs(chunks, metrics), metrics, utterances=own)
+        results = summarize_counts(counts, sum(turn["end"] - turn["start"] for turn in turns), metrics)
+        totals = results["sentiment_totals"]
+        rows[speaker] = (results["total_words"], results["unique_words"], results["speaking_pace"],
+                         results["filler_percentage"], results["filler_words"],
+                         totals["positive"], totals["neutral"], totals["negative"], round(totals["score_sum"], 9))
+    return rows
+
+def diarized_sample(transcript, speakers=("HOST", "GUEST"), turn_entries=6, seed=0):
+    """A speaker-labeled version of a caption transcript: runs of entries handed to alternating speakers."""
+    rng = np.random.default_rng(seed)
+    records, index, speaker = [], 0, 0
+    while index < len(transcript):
+        run = int(rng.integers(1, 2 * turn_entries))
+        for entry in transcript[index:index + run]:
+            records.append({"start": entry["start"], "end": entry["start"] + entry.get("duration", 0),
+                            "text": entry["text"], "speaker": speakers[speaker]})
+        index, speaker = index + run, (speaker + 1) % len(speakers)
+    return records
+
+def check_speaker_metrics(folder="transcripts"):
+    """Compares speaker_metrics with speech_analysis run on each speaker's segments, on every cached transcript."""
+    vectorized_seconds = reference_seconds = 0.0
+    mismatches = checked = 0
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        if path.endswith("_sponsorship.json"):
+            continue
+        with open(path, "r", encoding="utf-8") as file:
+            records = diarized_sample(json.load(file))
+        started = time.perf_counter()
+        expected = _reference_metrics(records)
+        reference_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        rows = speaker_metrics(records)
+        vectorized_seconds += time.perf_counter() - started
+        for row in rows:
+            checked += 1
+            totals = row["sentiment_totals"]
+            actual = (row["total_words"], row["unique_words"], row["speaking_pace"], row["filler_percentage"], row["filler_words"],
+                      totals["positive"], totals["neutral"], totals["negative"], round(totals["score_sum"], 9))
+            mismatches += actual != expected[row["speaker"]]
+    print(f"Per-speaker parity: {checked - mismatches}/{checked} speakers match")
+    print(f"Per-speaker re-analysis: {reference_seconds * 1000:.0f} ms, grouped pass: {vectorized_seconds * 1000:.0f} ms")
+    return mismatches == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_speaker_metrics() else 1)
@@ -0,0 +1,356 @@
+import re
+from collections import Counter
+
+import contractions
+import numpy as np
+from filler_engine import analyze_fillers, filler_counts
+from sentiment_engine import score_segments, score_totals, top_segments
+from instrumentation import span
+from model_registry import get_nlp
+from utterances import split_words
+
+COMMON_VERBS = {"have", "do", "be", "get", "make", "go", "say", "know", "think", "see", "take"}
+CONTENT_POS = {"NOUN", "VERB", "ADJ", "ADV"}
+TOPIC_LABELS = {"PERSON", "ORG", "GPE", "PRODUCT", "EVENT", "WORK_OF_ART"}
+NOUN_PHRASE_POS = {"ADJ", "NOUN", "PROPN", "NUM"}
+
+# Pipeline components each metric needs on top of the tokenizer
+METRIC_COMPONENTS = {
+    "words": set(),
+    "fillers": set(),
+    "top_words": {"tok2vec", "tagger", "attribute_ruler", "lemmatizer"},
+    "sentiment": set(),
+    "topics": {"tok2vec", "tagger", "attribute_ruler", "ner"},
+}
+ALL_METRICS = tuple(METRIC_COMPONENTS)
+
+# Bump whenever a change to the analysis (this module or analysis_cache) changes the stored counts
+ANALYSIS_VERSION = 5
+
+# Bump whenever a change to preprocessing or chunking changes the text that is parsed;
+# until then an ANALYSIS_VERSION bump recomputes the counts from the cached Docs
+PARSE_VERSION = 1
+
+# Defaults for batched parsing with nlp.pipe
+CHUNK_SIZE = 200
+BATCH_SIZE = 16
+
+# Preprocess text
+def preprocess_text(text):
+    if not text:
+        return ""
+    text = contractions.fix(text.lower())
+    text = re.sub(r"[^\w\s]", "", text)
+    return text.strip()
+
+# Preprocess many short texts (captions, segments) with one contractions.fix
+# call over all of them; same output as preprocess_text on each
+def preprocess_texts(texts):
+    texts = [text or "" for text in texts]
+    # Texts with their own line breaks would shift the split, so they are done one by one
+    batched = [index for index, text in enumerate(texts) if "\n" not in text]
+    fixed = contractions.fix("\n".join(texts[index].lower() for index in batched)).split("\n") if batched else []
+    if len(fixed) != len(batched):
+        return [preprocess_text(text) for text in texts]
+    results = [None] * len(texts)
+    for index, text in zip(batched, fixed):
+        results[index] = re.sub(r"[^\w\s]", "", text).strip()
+    return [preprocess_text(text) if result is None else result for text, result in zip(texts, results)]
+
+# Pipeline components a set of metrics needs
+def needed_components(metrics):
+    return set().union(*(METRIC_COMPONENTS[metric] for metric in metrics))
+
+# The shared spaCy pipeline for a set of metrics (loaded on first use, see
+# model_registry) and the components of it to enable
+def metric_pipeline(metrics):
+    needed = needed_components(metrics)
+    nlp = get_nlp(needed)
+    return nlp, [name for name in nlp.pipe_names if name in needed]
+
+# Parse text once with only the components the metrics need
+def parse_text(text, metrics=ALL_METRICS):
+    nlp, enabled = metric_pipeline(metrics)
+    with nlp.select_pipes(enable=enabled):
+        return nlp(text)
+
+# Join consecutive transcript entries into chunks of chunk_size entries
+def chunk_entries(entries, chunk_size=CHUNK_SIZE):
+    return [" ".join(entries[i:i + chunk_size]) for i in range(0, len(entries), chunk_size)]
+
+# Parse texts in batches, optionally across several processes
+def pipe_docs(texts, metrics=ALL_METRICS, batch_size=BATCH_SIZE, n_process=1):
+    nlp, enabled = metric_pipeline(metrics)
+    with nlp.select_pipes(enable=enabled):
+        yield from nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+
+# Count words
+def count_words(doc):
+    return sum(1 for token in doc if token.is_alpha)
+
+# count_words of each whitespace-separated word on its own; the tokenizer
+# splits text at whitespace first, so these add up to count_words of the text
+def word_alpha_counts(words):
+    tokenizer = get_nlp(needed_components(("words",))).tokenizer
+    return [count_words(doc) for doc in tokenizer.pipe(words)]
+
+# Filler percentage (of the top 5 fillers) and speaking pace from totals
+def speech_rates(total_words, duration_seconds, filler_words):
+    filler_count = sum(count for _, count in Counter(filler_words).most_common(5))
+    filler_percentage = round((filler_count / total_words) * 100, 2) if total_words > 0 else 0
+    speaking_pace = round(total_words / (duration_seconds / 60), 2) if duration_seconds > 0 else 0
+    return filler_percentage, speaking_pace
+
+# Compute speech metrics; pass the result of analyze_fillers to reuse its encoding of the text
+def compute_speech_metrics(text, duration_seconds, total_words, fillers=None):
+    fillers = fillers or analyze_fillers(text)
+    filler_percentage, speaking_pace = speech_rates(total_words, duration_seconds, dict(fillers["filler_words"]))
+    return total_words, fillers["unique_words"], filler_percentage, speaking_pace
+
+# Content words counted towards the most used words
+def content_words(doc):
+    return [
+        token.text for token in doc
+        if token.is_alpha and not token.is_stop and token.pos_ in CONTENT_POS
+        and token.lemma_ not in COMMON_VERBS
+    ]
+
+# Extract most used words
+def extract_most_used_words(doc, top_n=10):
+    return Counter(content_words(doc)).most_common(top_n)
+
+# Extract filler words
+def extract_fillers(text, top_n=5):
+    return analyze_fillers(text, top_n=top_n)["filler_words"]
+
+# Extract filler phrases
+def extract_filler_phrases(text, top_n=5):
+    fillers = analyze_fillers(text, top_n=top_n)
+    return fillers["two_word_fillers"], fillers["three_word_fillers"]
+
+# Analyze sentiment per sentence, or per run of words when the doc has no sentence boundaries
+def analyze_sentiment(doc):
+    if doc.has_annotation("SENT_START"):
+        return score_sentences([sent.text for sent in doc.sents])
+    return score_sentences(split_words(doc.text))
+
+# Score many sentences in one batch as (sentence, polarity) pairs
+def score_sentences(sentences):
+    return list(zip(sentences, score_segments(sentences).tolist()))
+
+# Mergeable sentiment totals: sentence counts per polarity and the sum of scores
+def sentiment_totals(sentiment_scores):
+    return {
+        "positive": sum(1 for _, score in sentiment_scores if score > 0),
+        "neutral": sum(1 for _, score in sentiment_scores if score == 0),
+        "negative": sum(1 for _, score in sentiment_scores if score < 0),
+        "score_sum": sum(score for _, score in sentiment_scores),
+    }
+
+# Categorize sentiment
+def categorize_sentiment(sentiment_scores):
+    return categorize_sentiment_totals(sentiment_totals(sentiment_scores))
+
+def categorize_sentiment_totals(totals):
+    positive, neutral, negative = totals["positive"], totals["neutral"], totals["negative"]
+    total = positive + neutral + negative
+    if total == 0:
+        return {"Positive": 0, "Neutral": 0, "Negative": 0, "Overall Sentiment": 0, "Label": "Neutral"}
+
+    overall_sentiment = totals["score_sum"] / total
+    sentiment_label = "Positive" if overall_sentiment > 0 else "Neutral" if overall_sentiment == 0 else "Negative"
+
+    return {
+        "Positive": round((positive / total) * 100, 2),
+        "Neutral": round((neutral / total) * 100, 2),
+        "Negative": round((negative / total) * 100, 2),
+        "Overall Sentiment": overall_sentiment,
+        "Label": sentiment_label
+    }
+
+# Get most positive and negative segments
+def extract_sentiment_segments(sentiment_scores, top_n=2):
+    sentences = [sent for sent, _ in sentiment_scores]
+    most_positive, most_negative = top_segments(sentences, np.array([score for _, score in sentiment_scores]), top_n)
+
+    return {
+        "Most Positive": [(sent, round(score, 2)) for sent, score in most_positive],
+        "Most Negative": [(sent, round(score, 2)) for sent, score in most_negative]
+    }
+
+# Named entities and multi-word noun phrases counted as topics
+def topic_terms(doc):
+    # Extract Named Entities (NER) - Focus on meaningful categories
+    entities = [ent.text.lower() for ent in doc.ents if ent.label_ in TOPIC_LABELS]
+
+    # Extract Important Noun Phrases (Filtering stopwords & pronouns)
+    phrases = [
+        chunk.text.lower() for chunk in noun_phrases(doc)
+        if len(chunk.text.split()) > 1 and not any(token.is_stop or token.pos_ == "PRON" for token in chunk)
+    ]
+
+    return entities + phrases
+
+# Noun phrases: the parser's noun chunks when it ran, otherwise the tagged ones
+def noun_phrases(doc):
+    if doc.has_annotation("DEP"):
+        return list(doc.noun_chunks)
+    return tagged_noun_phrases(doc)
+
+# Runs of adjectives, numbers and nouns that end in a noun, read off the POS
+# tags so topics don't need the parser (see check_noun_phrases for how close
+# they come to the parser's noun chunks)
+def tagged_noun_phrases(doc):
+    phrases, start = [], None
+    for token in list(doc) + [None]:
+        if token is not None and token.pos_ in NOUN_PHRASE_POS:
+            start = token.i if start is None else start
+            continue
+        if start is not None:
+            end = token.i if token is not None else len(doc)
+            while end > start and doc[end - 1].pos_ not in ("NOUN", "PROPN"):
+                end -= 1
+            if end > start:
+                phrases.append(doc[start:end])
+            start = None
+    return phrases
+
+# Extract the most frequent topics
+def extract_focused_topics(doc, top_n=10):
+    return Counter(topic_terms(doc)).most_common(top_n)
+
+# Multi-word phrases without stopwords or pronouns, as topic_terms keeps them
+def _topic_phrases(phrases):
+    return Counter(phrase.text.lower() for phrase in phrases if len(phrase) > 1
+                   and not any(token.is_stop or token.pos_ == "PRON" for token in phrase))
+
+def check_noun_phrases(folder="transcripts", top_n=10):
+    """Compares the tagged noun phrases with the parser's noun chunks over every cached transcript.
+
+    Reports how many of the chunk-based topic phrases the tagged ones find
+    (recall), how many of theirs are chunks too (precision), and how many of
+    each video's top_n phrase topics agree.
+    """
+    import glob
+    import json
+    import os
+    nlp = get_nlp(METRIC_COMPONENTS["topics"] | {"parser"})
+    both = chunk_total = tagged_total = top_shared = top_total = 0
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        if path.endswith("_sponsorship.json"):
+            continue
+        with open(path, "r", encoding="utf-8") as file:
+            chunks = [chunk for chunk in map(preprocess_text, chunk_entries([entry["text"] for entry in json.load(file)])) if chunk]
+        chunk_phrases, tagged_phrases = Counter(), Counter()
+        for doc in nlp.pipe(chunks, batch_size=BATCH_SIZE):
+            chunk_phrases.update(_topic_phrases(doc.noun_chunks))
+            tagged_phrases.update(_topic_phrases(tagged_noun_phrases(doc)))
+        both += sum((chunk_phrases & tagged_phrases).values())
+        chunk_total += sum(chunk_phrases.values())
+        tagged_total += sum(tagged_phrases.values())
+        top_chunks = {phrase for phrase, _ in chunk_phrases.most_common(top_n)}
+        top_shared += len(top_chunks & {phrase for phrase, _ in tagged_phrases.most_common(top_n)})
+        top_total += len(top_chunks)
+    print(f"Recall: {both}/{chunk_total} noun chunk phrases ({both / max(chunk_total, 1):.1%})")
+    print(f"Precision: {both}/{tagged_total} tagged phrases ({both / max(tagged_total, 1):.1%})")
+    print(f"Top {top_n} per video: {top_shared}/{top_total} shared ({top_shared / max(top_total, 1):.1%})")
+    return both, chunk_total, tagged_total
+
+# Fields of the counts that are Counters and merge by adding them up
+COUNTER_FIELDS = ("top_words", "topics", "word_counts", "filler_words",
+                  "two_word_fillers", "three_word_fillers", "multi_word_fillers")
+
+def empty_counts():
+    counts = {"text": "", "total_words": 0, "sentiment_scores": [],
+              "sentiment_totals": {"positive": 0, "neutral": 0, "negative": 0, "score_sum": 0.0}}
+    counts.update((field, Counter()) for field in COUNTER_FIELDS)
+    return counts
+
+# Count every metric of parsed chunks of preprocessed text as mergeable
+# partials: word, filler and n-gram Counters, sentiment totals and word totals.
+# Sentiment is scored per utterance (see utterances.segment_utterances) when
+# they are given, otherwise per run of words. The joined text is kept for
+# the Gemini suggestions.
+def count_docs(chunks, docs, metrics=ALL_METRICS, utterances=None):
+    counts = empty_counts()
+    counts["text"] = " ".join(chunks)
+    with span("word_counts"):
+        for doc in docs:
+            if "words" in metrics:
+                counts["total_words"] += count_words(doc)
+            if "top_words" in metrics:
+                counts["top_words"].update(content_words(doc))
+            if "topics" in metrics:
+                counts["topics"].update(topic_terms(doc))
+    sentences = []
+    with span("sentiment") as timing:
+        if "sentiment" in metrics:
+            if utterances is None:
+                sentences = [segment for chunk in chunks for segment in split_words(chunk)]
+            else:
+                sentences = [text for text in map(preprocess_text, utterances) if text]
+        # Every sentence is scored in a single batch
+        scores = score_segments(sentences)
+        counts["sentiment_scores"] = list(zip(sentences, scores.tolist()))
+        counts["sentiment_totals"] = score_totals(scores)
+        timing.set(sentences=len(sentences))
+    if "words" in metrics or "fillers" in metrics:
+        with span("fillers"):
+            counts.update(filler_counts(counts["text"]))
+    return counts
+
+# Merge the counts of several videos into one. Counters keep their keys in
+# order of first occurrence, so ties rank as if the texts had been joined.
+def merge_counts(counts_list):
+    merged = empty_counts()
+    merged["text"] = " ".join(counts["text"] for counts in counts_list if counts.get("text"))
+    for counts in counts_list:
+        merged["total_words"] += counts["total_words"]
+        merged["sentiment_scores"].extend(counts.get("sentiment_scores", []))
+        for key, value in counts["sentiment_totals"].items():
+            merged["sentiment_totals"][key] += value
+        for field in COUNTER_FIELDS:
+            merged[field].update(counts[field])
+    return merged
+
+# Turn counts into the dashboard's metrics, from the partials alone
+def summarize_counts(counts, duration_seconds=0, metrics=ALL_METRICS, top_topics=10):
+    results = {"text": counts.get("text", "")}
+    if "words" in metrics:
+        results["total_words"] = counts["total_words"]
+        results["unique_words"] = len(counts["word_counts"])
+        results["filler_percentage"], results["speaking_pace"] = speech_rates(
+            counts["total_words"], duration_seconds, counts["filler_words"])
+    if "fillers" in metrics:
+        for field in ("filler_words", "two_word_fillers", "three_word_fillers", "multi_word_fillers"):
+            results[field] = Counter(counts[field]).most_common(5)
+    if "top_words" in metrics:
+        results["most_used_words"] = Counter(counts["top_words"]).most_common(10)
+    if "sentiment" in metrics:
+        results["sentiment_scores"] = [(sent, score) for sent, score in counts.get("sentiment_scores", [])]
+        results["sentiment_totals"] = dict(counts["sentiment_totals"])
+    if "topics" in metrics:
+        results["focused_topics"] = Counter(counts["topics"]).most_common(top_topics)
+    return results
+
+# Parse raw transcript entries in chunks of chunk_size entries through
+# nlp.pipe with n_process worker processes; returns the chunks and docs
+def parse_entries(entries, metrics=ALL_METRICS, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, n_process=1):
+    with span("preprocess", entries=len(entries)):
+        chunks = [chunk for chunk in map(preprocess_text, chunk_entries(entries, chunk_size)) if chunk]
+    with span("parse", chunks=len(chunks), n_process=n_process):
+        return chunks, list(pipe_docs(chunks, metrics, batch_size=batch_size, n_process=n_process))
+
+# Run every requested metric over a single parse of the preprocessed text
+def analyze_text(text, duration_seconds=0, metrics=ALL_METRICS, top_topics=10):
+    counts = count_docs([text], [parse_text(text, metrics)], metrics)
+    return summarize_counts(counts, duration_seconds, metrics, top_topics)
+
+# Run every requested metric over raw transcript entries
+def analyze_entries(entries, duration_seconds=0, metrics=ALL_METRICS, top_topics=10,
+                    chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, n_process=1):
+    chunks, docs = parse_entries(entries, metrics, chunk_size, batch_size, n_process)
+    return summarize_counts(count_docs(chunks, docs, metrics), duration_seconds, metrics, top_topics)
+
+if __name__ == "__main__":
+    check_noun_phrases()
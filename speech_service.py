@@ -0,0 +1,190 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from audio_ingest import SharedAudio, read_shared
+from speaker_alignment import align_segments, speaker_turns, write_jsonl, write_transcript
+from speaker_metrics import speaker_metrics
+
+# Whisper model and backend: "whisper" (openai-whisper) or "faster-whisper" (CTranslate2)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "medium")
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "faster-whisper")
+
+# "int8" quantizes the model for CPU inference (dynamic int8 Linear layers with
+# openai-whisper, int8 compute with faster-whisper); "float32" keeps full precision
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+
+DIARIZATION_MODEL = os.getenv("DIARIZATION_MODEL", "pyannote/speaker-diarization")
+HF_TOKEN = os.getenv("HF_TOKEN")
+
+# Transcription worker processes, each holding one Whisper model, and the torch threads each uses
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+THREADS_PER_WORKER = int(os.getenv("TRANSCRIBE_THREADS", "2"))
+
+# Long recordings are transcribed in chunks that overlap their neighbours by CHUNK_OVERLAP_SECONDS
+CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "600"))
+CHUNK_OVERLAP_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_OVERLAP_SECONDS", "5"))
+
+def plan_chunks(duration, chunk_seconds=CHUNK_SECONDS, overlap_seconds=CHUNK_OVERLAP_SECONDS):
+    """(decode_start, decode_end, keep_start, keep_end) per chunk. Each chunk is decoded with
+    overlap_seconds of context on both sides; only segments centered in [keep_start, keep_end) are kept."""
+    chunks, start = [], 0.0
+    while start < duration:
+        end = min(start + chunk_seconds, duration)
+        chunks.append((max(0.0, start - overlap_seconds), min(duration, end + overlap_seconds), start, end))
+        start = end
+    return chunks
+
+# Per-process models; each worker process loads its model once and keeps it for every job
+_whisper = None
+_whisper_backend = None
+_diarization = None
+
+def _load_whisper(model_name, backend, compute_type, threads):
+    global _whisper, _whisper_backend
+    _whisper_backend = backend
+    if backend == "faster-whisper":
+        from faster_whisper import WhisperModel
+        _whisper = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=threads)
+        return
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    model = whisper.load_model(model_name, device="cpu")
+    if compute_type == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    _whisper = model
+
+def _load_diarization(model_name, token, threads):
+    global _diarization
+    import torch
+    from pyannote.audio import Pipeline
+    torch.set_num_threads(threads)
+    _diarization = Pipeline.from_pretrained(model_name, use_auth_token=token)
+
+def transcribe_chunk(audio_handle, chunk):
+    """Runs in a transcription worker: the segments of one chunk of a SharedAudio, in recording time."""
+    decode_start, decode_end, keep_start, keep_end = chunk
+    sample_rate = audio_handle[2]
+    audio = read_shared(audio_handle, int(decode_start * sample_rate), int(decode_end * sample_rate))
+    if _whisper_backend == "faster-whisper":
+        pieces, _ = _whisper.transcribe(audio)
+        pieces = [(piece.start, piece.end, piece.text) for piece in pieces]
+    else:
+        pieces = [(piece["start"], piece["end"], piece["text"]) for piece in _whisper.transcribe(audio, fp16=False)["segments"]]
+    segments = []
+    for start, end, text in pieces:
+        start, end = start + decode_start, end + decode_start
+        # Each segment belongs to the one chunk its midpoint falls in, so the overlaps are not duplicated
+        if keep_start <= (start + end) / 2 < keep_end:
+            segments.append({"start": round(start, 3), "end": round(end, 3), "text": text})
+    return segments
+
+def diarize(audio_handle):
+    """Runs in the diarization worker: (start, end, speaker) turns of a whole SharedAudio recording."""
+    import torch
+    waveform = torch.from_numpy(read_shared(audio_handle)).unsqueeze(0)
+    result = _diarization({"waveform": waveform, "sample_rate": audio_handle[2]})
+    return [(turn.start, turn.end, speaker) for turn, _, speaker in result.itertracks(yield_label=True)]
+
+class TranscriptionService:
+    """Long-lived CPU transcription and diarization.
+
+    Whisper runs in a pool of worker processes that each load the model once;
+    pyannote runs in its own process, also loaded once. A recording's chunks
+    and its diarization are submitted together, so both stages run at the
+    same time and the pools stay busy across recordings.
+    """
+
+    def __init__(self, workers=TRANSCRIBE_WORKERS, threads_per_worker=THREADS_PER_WORKER, model_name=WHISPER_MODEL,
+                 backend=WHISPER_BACKEND, compute_type=WHISPER_COMPUTE_TYPE, diarization_model=DIARIZATION_MODEL,
+                 hf_token=HF_TOKEN, chunk_seconds=CHUNK_SECONDS, overlap_seconds=CHUNK_OVERLAP_SECONDS):
+        context = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self._transcribers = ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_load_whisper,
+            initargs=(model_name, backend, compute_type, threads_per_worker),
+        )
+        self._diarizer = ProcessPoolExecutor(
+            max_workers=1, mp_context=context, initializer=_load_diarization,
+            initargs=(diarization_model, hf_token, threads_per_worker),
+        )
+
+    def submit(self, path, source=None):
+        """Queues a recording; returns a function that waits for and returns its result.
+
+        The recording (path, or source as bytes or a file object for uploads) is
+        decoded once into shared memory, which every stage reads; no temp files.
+        """
+        audio = SharedAudio.decode(path if source is None else source)
+        duration = audio.duration
+        turns = self._diarizer.submit(diarize, audio.handle)
+        chunks = [self._transcribers.submit(transcribe_chunk, audio.handle, chunk)
+                  for chunk in plan_chunks(duration, self.chunk_seconds, self.overlap_seconds)]
+
+        def result():
+            try:
+                segments = [segment for chunk in chunks for segment in chunk.result()]
+                records = align_segments(turns.result(), segments)
+            finally:
+                wait(chunks + [turns])
+                audio.close()
+            return {"path": path, "duration": duration, "records": records, "turns": speaker_turns(records),
+                    "speakers": speaker_metrics(records)}
+        return result
+
+    def process(self, path):
+        """Transcribes and diarizes one recording: {"path", "duration", "records", "turns", "speakers"}."""
+        return self.submit(path)()
+
+    def process_many(self, paths, in_flight=None):
+        """Yields the results of several recordings in order.
+
+        At most in_flight recordings (default: one per transcription worker)
+        are decoded into shared memory and queued at a time, so memory stays
+        bounded and results come out while later recordings are still waiting.
+        Each result frees its audio before the next recording is decoded.
+        """
+        in_flight = max(1, in_flight or self.workers)
+        pending = deque()
+        for path in paths:
+            if len(pending) >= in_flight:
+                yield pending.popleft()()
+            pending.append(self.submit(path))
+        while pending:
+            yield pending.popleft()()
+
+    def close(self):
+        self._transcribers.shutdown()
+        self._diarizer.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Speaker-labeled transcripts of recordings on CPU.")
+    parser.add_argument("recordings", nargs="+")
+    parser.add_argument("-o", "--output", default="speaker_transcripts", help="folder for the .txt, .jsonl and _speakers.json outputs")
+    args = parser.parse_args()
+    if not HF_TOKEN:
+        sys.exit("❌ Set HF_TOKEN to a Hugging Face token with access to the pyannote models.")
+    os.makedirs(args.output, exist_ok=True)
+    with TranscriptionService() as service:
+        started = time.perf_counter()
+        for result in service.process_many(args.recordings):
+            name = os.path.splitext(os.path.basename(result["path"]))[0]
+            write_transcript(result["turns"], os.path.join(args.output, f"{name}.txt"))
+            write_jsonl(result["records"], os.path.join(args.output, f"{name}.jsonl"))
+            with open(os.path.join(args.output, f"{name}_speakers.json"), "w", encoding="utf-8") as file:
+                json.dump(result["speakers"], file, indent=2)
+            elapsed = time.perf_counter() - started
+            print(f"✅ {result['path']}: {result['duration'] / 60:.1f} min of audio, {len(result['turns'])} turns ({elapsed:.0f} s elapsed)")
@@ -0,0 +1,74 @@
+import os
+import re
+import numpy as np
+from filler_engine import FILLER_WORDS
+from instrumentation import timed
+from sentiment_engine import score_segments
+from speech_analysis import preprocess_text
+
+# Length of one timeline window in seconds
+TIMELINE_WINDOW_SECONDS = float(os.getenv("TIMELINE_WINDOW_SECONDS", "30"))
+
+# Windows with less speech than this get no pace, filler density or sentiment
+MIN_SPEAKING_SECONDS = 5.0
+
+# Columns of the per-window array returned by windowed_metrics
+TIMELINE_COLUMNS = ("start", "end", "words", "speaking_seconds", "pace", "filler_density", "sentiment")
+
+# Caption entries such as "[Music]" or "(applause)" that are not speech
+NON_SPEECH = re.compile(r"^\s*[\[(][^\])]*[\])]\s*$")
+
+@timed("timeline")
+def windowed_metrics(transcript, window_seconds=TIMELINE_WINDOW_SECONDS, min_speaking_seconds=MIN_SPEAKING_SECONDS):
+    """Speaking pace, filler density and sentiment per window_seconds window in one pass over the entries.
+
+    transcript is an iterable of {"text", "start", "duration"} entries in start
+    order, as returned by the transcript fetcher. Each entry's words are spread
+    evenly over its duration; pace is words per minute of actual speech, where
+    speech is the union of the entry intervals, so gaps, silences and non-speech
+    captions like "[Music]" do not drag it down. Returns a float32 array with one
+    row per window and TIMELINE_COLUMNS as columns; windows with less than
+    min_speaking_seconds of speech have NaN pace, filler density and sentiment.
+    """
+    speech = []
+    for entry in transcript:
+        if NON_SPEECH.match(entry["text"]):
+            continue
+        text = preprocess_text(entry["text"])
+        if text:
+            start = float(entry["start"])
+            speech.append((start, start + max(float(entry.get("duration", 0)), 0.0), text))
+    # All captions are scored for sentiment in one batch before the pass over the windows
+    scores = score_segments([text for _, _, text in speech]).tolist()
+
+    words, fillers, polarity, speaking = [], [], [], []
+    covered_until = 0.0
+    for (start, end, text), score in zip(speech, scores):
+        tokens = text.split()
+        filler_count = sum(token in FILLER_WORDS for token in tokens)
+
+        first, last = int(start // window_seconds), int(end // window_seconds)
+        while len(words) <= last:
+            for column in (words, fillers, polarity, speaking):
+                column.append(0.0)
+        for window in range(first, last + 1):
+            low = max(start, window * window_seconds)
+            high = min(end, (window + 1) * window_seconds)
+            share = (high - low) / (end - start) if end > start else 1.0
+            words[window] += len(tokens) * share
+            fillers[window] += filler_count * share
+            polarity[window] += score * len(tokens) * share
+            # Captions overlap, so only count time not already covered by an earlier entry
+            speaking[window] += max(0.0, high - max(low, covered_until))
+        covered_until = max(covered_until, end)
+
+    words, fillers, polarity, speaking = (np.array(column) for column in (words, fillers, polarity, speaking))
+    starts = np.arange(len(words)) * window_seconds
+    spoken = speaking >= min_speaking_seconds
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pace = np.where(spoken, words / speaking * 60, np.nan)
+        filler_density = np.where(spoken, fillers / words * 100, np.nan)
+        sentiment = np.where(spoken, polarity / words, np.nan)
+    return np.column_stack(
+        (starts, starts + window_seconds, words, speaking, pace, filler_density, sentiment)
+    ).astype(np.float32).reshape(-1, len(TIMELINE_COLUMNS))
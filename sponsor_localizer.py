@@ -0,0 +1,203 @@
+import csv
+import glob
+import json
+import os
+import re
+from difflib import SequenceMatcher
+from instrumentation import timed
+
+# Phrases that typically open, carry or close a sponsor read, with their weights
+SPONSOR_CUES = {
+    "sponsor": 3, "sponsored": 3, "sponsoring": 3, "sponsors": 3, "brought to you by": 3,
+    "partner of today": 3, "partnered with": 3, "our partners": 2, "today's partner": 3,
+    "thanks to": 1, "thank you to": 1, "shout out to": 2, "a quick second": 1,
+    "promo code": 3, "coupon code": 3, "discount code": 3, "use code": 3, "use my code": 3,
+    "percent off": 2, "% off": 2, "free trial": 2, "sign up": 1, "first month": 1,
+    "link in the description": 3, "link below": 2, "links below": 2, "description box": 2,
+    "linked in the description": 3, "down below": 1, "check out": 1, "head to": 1, "head over to": 1,
+}
+CUE_PATTERN = re.compile("|".join(re.escape(cue) for cue in sorted(SPONSOR_CUES, key=len, reverse=True)))
+URL_PATTERN = re.compile(r"\b[\w-]+\s?(?:\.|dot)\s?(?:com|co|io|in|org|net)\b|\bslash\s+\w+")
+CODE_PATTERN = re.compile(r"\bcode\s+[a-z]*\d[a-z0-9]*\b")
+URL_WEIGHT = 2
+CODE_WEIGHT = 3
+PRODUCT_WEIGHT = 4
+PRODUCT_MATCH_RATIO = 0.8
+
+WINDOW_SECONDS = 60
+STEP_SECONDS = 15
+CONTEXT_SECONDS = 45
+TOP_K = 2
+
+NON_ALNUM = re.compile(r"[^a-z0-9]")
+
+def _compact(text):
+    return NON_ALNUM.sub("", text.lower())
+
+def _product_hits(words, product):
+    """Yields the word positions where the product name starts, allowing spelling and spacing slips.
+
+    Runs of one to three words are compared without spaces, so captions like
+    "style vanana" still match "Stylevana" and "golden pie" matches "GoldenPi".
+    """
+    target = _compact(product)
+    if not target:
+        return
+    matcher = SequenceMatcher(autojunk=False)
+    matcher.set_seq2(target)
+    for i in range(len(words)):
+        # Misspelled captions almost always keep the first letter, which rules out most runs cheaply
+        if not words[i].startswith(target[0]):
+            continue
+        candidate = ""
+        for word in words[i:i + 3]:
+            candidate += word
+            if abs(len(candidate) - len(target)) > len(target) * (1 - PRODUCT_MATCH_RATIO) + 1:
+                if len(candidate) > len(target):
+                    break
+                continue
+            matcher.set_seq1(candidate)
+            if matcher.quick_ratio() >= PRODUCT_MATCH_RATIO and matcher.ratio() >= PRODUCT_MATCH_RATIO:
+                yield i
+                break
+
+def score_entries(transcript, expected_product=""):
+    """Scores every transcript entry for sponsor cues in one pass."""
+    scores = [0] * len(transcript)
+    words, owners = [], []
+    for index, entry in enumerate(transcript):
+        text = entry["text"].lower()
+        scores[index] += sum(SPONSOR_CUES[match.group(0)] for match in CUE_PATTERN.finditer(text))
+        scores[index] += URL_WEIGHT * len(URL_PATTERN.findall(text)) + CODE_WEIGHT * len(CODE_PATTERN.findall(text))
+        for word in text.split():
+            compact = _compact(word)
+            if compact:
+                words.append(compact)
+                owners.append(index)
+    # The product name may straddle two caption entries, so match over the flat word stream
+    for position in _product_hits(words, expected_product or ""):
+        scores[owners[position]] += PRODUCT_WEIGHT
+    return scores
+
+@timed("sponsor_localizer")
+def localize_sponsor_segments(transcript, expected_product="", window_seconds=WINDOW_SECONDS,
+                              step_seconds=STEP_SECONDS, context_seconds=CONTEXT_SECONDS, top_k=TOP_K):
+    """Returns up to top_k time windows most likely to hold the sponsor read.
+
+    Each window is {"start", "end", "score"} in seconds, padded by
+    context_seconds on both sides and merged with any window it overlaps.
+    """
+    if not transcript:
+        return []
+    scores = score_entries(transcript, expected_product)
+    starts = [float(entry["start"]) for entry in transcript]
+    end_of_video = starts[-1] + float(transcript[-1].get("duration", 0))
+
+    # Slide a window over the entries with two pointers, keeping a running score
+    windows = []
+    first = last = 0
+    total = 0
+    window_start = starts[0]
+    while window_start <= end_of_video:
+        while last < len(starts) and starts[last] < window_start + window_seconds:
+            total += scores[last]
+            last += 1
+        while first < last and starts[first] < window_start:
+            total -= scores[first]
+            first += 1
+        if total > 0:
+            windows.append((total, window_start))
+        window_start += step_seconds
+
+    chosen = []
+    for score, window_start in sorted(windows, key=lambda window: (-window[0], window[1])):
+        if len(chosen) == top_k:
+            break
+        if all(abs(window_start - other["window_start"]) >= window_seconds for other in chosen):
+            chosen.append({"window_start": window_start, "score": score})
+
+    segments = []
+    for window in sorted(chosen, key=lambda window: window["window_start"]):
+        start = max(0.0, window["window_start"] - context_seconds)
+        end = min(end_of_video, window["window_start"] + window_seconds + context_seconds)
+        if segments and start <= segments[-1]["end"]:
+            segments[-1]["end"] = max(segments[-1]["end"], end)
+            segments[-1]["score"] += window["score"]
+        else:
+            segments.append({"start": start, "end": end, "score": window["score"]})
+    return segments
+
+def select_entries(transcript, segments):
+    """Returns the entries that start inside any of the segments, in transcript order."""
+    return [
+        entry for entry in transcript
+        if any(segment["start"] <= entry["start"] < segment["end"] for segment in segments)
+    ]
+
+def _parse_timestamp(timestamp):
+    minutes, _, seconds = str(timestamp).partition(":")
+    try:
+        return int(minutes) * 60 + int(seconds)
+    except ValueError:
+        return None
+
+def _locate_text(transcript, text, words=8):
+    """Start time of the entry where `text` begins, or None if it cannot be found."""
+    needle = " ".join(_compact(word) for word in text.split()[:words])
+    stream, owners = [], []
+    for index, entry in enumerate(transcript):
+        for word in entry["text"].split():
+            stream.append(_compact(word))
+            owners.append(index)
+    haystack = " ".join(stream)
+    position = haystack.find(needle)
+    if position < 0 or not needle:
+        return None
+    return float(transcript[owners[haystack[:position].count(" ")]]["start"])
+
+def evaluate(folder="transcripts", results_csv="sponsorship_analysis.csv"):
+    """Scores the localizer against the stored sponsorship results.
+
+    Ground truth is where the stored ad text actually starts in the
+    transcript, falling back to the stored start time. Prints recall,
+    the start-time error of the best window and the share of the
+    transcript that would still be sent to the model.
+    """
+    expected = {}
+    if os.path.exists(results_csv):
+        with open(results_csv, newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                expected[row["Video URL"][-11:]] = row
+    found = total = 0
+    errors = []
+    sent_chars = total_chars = 0
+    for path in sorted(glob.glob(os.path.join(folder, "*_sponsorship.json"))):
+        video_id = os.path.basename(path)[:-len("_sponsorship.json")]
+        with open(path, "r", encoding="utf-8") as file:
+            result = json.load(file)
+        with open(os.path.join(folder, f"{video_id}.json"), "r", encoding="utf-8") as file:
+            transcript = json.load(file)
+        truth = _locate_text(transcript, result.get("advertisement_text", ""))
+        if truth is None:
+            truth = _parse_timestamp(result.get("start_time") or expected.get(video_id, {}).get("Start Time"))
+        if truth is None:
+            continue
+        segments = localize_sponsor_segments(transcript, result.get("expected_product", ""))
+        total += 1
+        hit = any(segment["start"] <= truth < segment["end"] for segment in segments)
+        found += hit
+        if segments:
+            best = max(segments, key=lambda segment: segment["score"])
+            errors.append(abs(best["start"] + CONTEXT_SECONDS - truth))
+        selected = select_entries(transcript, segments)
+        sent_chars += sum(len(entry["text"]) for entry in selected)
+        total_chars += sum(len(entry["text"]) for entry in transcript)
+        print(f"{video_id}: {'hit ' if hit else 'MISS'} truth={truth:.0f}s windows={[(round(s['start']), round(s['end'])) for s in segments]}")
+    if total:
+        errors.sort()
+        print(f"Recall: {found}/{total} ({found / total:.0%})")
+        print(f"Median start error of best window: {errors[len(errors) // 2]:.0f}s")
+        print(f"Share of transcript text sent to the model: {sent_chars / total_chars:.1%}")
+
+if __name__ == "__main__":
+    evaluate()
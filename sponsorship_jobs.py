@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+import os
+import threading
+import time
+
+MANIFEST_PATH = "sponsorship_manifest.jsonl"
+RESULTS_PATH = "sponsorship_results.jsonl"
+CSV_PATH = "sponsorship_analysis.csv"
+
+# Statuses that mean a video needs no more work; anything else is retried on resume
+COMPLETE_STATUSES = {"done", "no_ad"}
+
+CSV_HEADER = [
+    "Influencer Name", "Video URL", "Advertisement Text", "Product",
+    "Start Time", "End Time", "Expected Product", "Match", "Inference",
+    "Ad Naturalness", "Persuasiveness", "Trustworthiness", "Ad Length & Placement", "Engagement", "Ad Classification"
+]
+
+CSV_FIELDS = [
+    "influencer_name", "video_url", "advertisement_text", "product_name",
+    "start_time", "end_time", "expected_product", "match_accuracy", "inference",
+    "ad_naturalness", "persuasiveness", "trustworthiness", "ad_length_placement", "engagement", "ad_classification"
+]
+
+def csv_row(entry):
+    # A field the model left out becomes an empty cell instead of aborting the run
+    return [entry.get(field, "") for field in CSV_FIELDS]
+
+def _read_jsonl(path):
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A crash mid-write can leave a truncated last line; it is simply redone
+                continue
+    return records
+
+def _append(path, text):
+    """Appends text in one write and forces it to disk, so a crash never loses a finished record."""
+    with open(path, "a", encoding="utf-8", newline="") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+
+def _terminate_last_line(path):
+    # Make sure a truncated last line can't swallow the next appended record
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb+") as file:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                file.write(b"\n")
+
+class SponsorshipRun:
+    """Checkpointed sponsorship batch run.
+
+    Every finished video is appended to a JSONL manifest (per-video status),
+    a JSONL results file and the CSV as soon as it completes. With
+    resume=True the previous run's files are kept and completed videos are
+    skipped; otherwise they are cleared for a fresh run.
+    """
+
+    def __init__(self, manifest_path=MANIFEST_PATH, results_path=RESULTS_PATH, csv_path=CSV_PATH, resume=False):
+        self.manifest_path = manifest_path
+        self.results_path = results_path
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        if not resume:
+            for path in (manifest_path, results_path, csv_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        for path in (manifest_path, results_path, csv_path):
+            _terminate_last_line(path)
+        self.statuses = {record["video_url"]: record for record in _read_jsonl(manifest_path)}
+        if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+            _append(csv_path, self._csv_text([CSV_HEADER]))
+
+    @staticmethod
+    def _csv_text(rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    def status(self, video_url):
+        record = self.statuses.get(video_url)
+        return record["status"] if record else "pending"
+
+    def is_complete(self, video_url):
+        return self.status(video_url) in COMPLETE_STATUSES
+
+    def record(self, video_url, status, result=None, error=None):
+        """Checkpoints one video: the result first, then its status in the manifest."""
+        entry = {"video_url": video_url, "status": status, "updated": time.time()}
+        if error:
+            entry["error"] = error
+        with self._lock:
+            if result:
+                result = {**result, "video_url": video_url}
+                _append(self.results_path, json.dumps(result) + "\n")
+                _append(self.csv_path, self._csv_text([csv_row(result)]))
+            _append(self.manifest_path, json.dumps(entry) + "\n")
+            self.statuses[video_url] = entry
+
+    def results(self):
+        """All results recorded so far, latest per video, including earlier runs when resuming."""
+        latest = {}
+        for result in _read_jsonl(self.results_path):
+            latest[result["video_url"]] = result
+        return [result for url, result in latest.items() if self.status(url) == "done"]
+
+    def summary(self):
+        counts = {}
+        for record in self.statuses.values():
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return counts
@@ -0,0 +1,143 @@
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from instrumentation import in_context, span
+
+YOUTUBE_HOST = "www.youtube.com"
+
+# Point every entry point at a local transcript server instead of YouTube,
+# e.g. `python -m http.server 8000 --directory transcripts`
+TRANSCRIPT_SERVER_URL = os.getenv("TRANSCRIPT_SERVER_URL")
+
+# Errors raised by youtube_transcript_api when YouTube throttles or blocks us
+THROTTLE_ERRORS = {"TooManyRequests", "RequestBlocked", "IpBlocked"}
+
+# Concurrency caps shared by every fetcher in the process, one per host
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+class TranscriptThrottled(Exception):
+    """Raised by a transcript source when the host asks us to slow down."""
+
+def is_throttled(error):
+    """Tells whether an error means the host is rate limiting us."""
+    if isinstance(error, TranscriptThrottled) or type(error).__name__ in THROTTLE_ERRORS:
+        return True
+    return "429" in str(error) or "Too Many Requests" in str(error)
+
+def is_transient(error):
+    """Tells whether a failed request is worth retrying."""
+    if is_throttled(error):
+        return True
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500
+    return isinstance(error, (ConnectionError, TimeoutError, urllib.error.URLError))
+
+def host_limit(host, limit):
+    """Returns the process-wide semaphore capping concurrent requests to a host."""
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(limit)
+        return _host_limits[host]
+
+def youtube_transcript_source(video_id):
+    """Fetches a transcript from YouTube; the client library is imported on the first fetch."""
+    from youtube_transcript_api import YouTubeTranscriptApi
+    return YouTubeTranscriptApi.get_transcript(video_id)
+
+def http_transcript_source(base_url, timeout=30):
+    """Builds a source that reads `<base_url>/<video_id>.json` transcripts over HTTP."""
+    def fetch(video_id):
+        try:
+            with urllib.request.urlopen(f"{base_url.rstrip('/')}/{video_id}.json", timeout=timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                raise TranscriptThrottled(f"{base_url} returned 429 for {video_id}") from e
+            raise
+    return fetch
+
+class TranscriptFetcher:
+    """Fetches transcripts concurrently with a per-host cap, retries and backoff.
+
+    Each transcript is a list of {"text", "start", "duration"} entries, or an
+    empty list when it could not be fetched. Requests for a video that is
+    already in flight share the same future instead of hitting the host again.
+    """
+
+    def __init__(self, source=None, host=None, max_workers=8, per_host_limit=4,
+                 max_retries=4, backoff_seconds=1.0, max_backoff_seconds=30.0):
+        if source is None and TRANSCRIPT_SERVER_URL:
+            source, host = http_transcript_source(TRANSCRIPT_SERVER_URL), urlparse(TRANSCRIPT_SERVER_URL).netloc
+        self.source = source or youtube_transcript_source
+        self.host = host or YOUTUBE_HOST
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._limit = host_limit(self.host, per_host_limit)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._in_flight = {}
+        self._lock = threading.RLock()
+
+    def _fetch_with_retries(self, video_id):
+        with span("fetch", video_id=video_id, host=self.host) as timing:
+            transcript = self._fetch_attempts(video_id, timing)
+            timing.set(entries=len(transcript))
+            return transcript
+
+    def _fetch_attempts(self, video_id, timing):
+        attempt = 0
+        while True:
+            try:
+                with self._limit:
+                    transcript = self.source(video_id)
+                timing.set(retries=attempt)
+                return transcript
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.max_retries:
+                    print(f"❌ Error fetching transcript for {video_id}: {e}")
+                    timing.set(retries=attempt, failed=type(e).__name__)
+                    return []
+                # Exponential backoff with jitter so parallel workers don't retry in lockstep
+                delay = min(self.backoff_seconds * 2 ** attempt, self.max_backoff_seconds)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                attempt += 1
+
+    def _finish(self, video_id, future):
+        with self._lock:
+            if self._in_flight.get(video_id) is future:
+                del self._in_flight[video_id]
+
+    def submit(self, video_id):
+        """Starts fetching a transcript, reusing the in-flight request if there is one."""
+        with self._lock:
+            future = self._in_flight.get(video_id)
+            if future is None:
+                future = self._executor.submit(in_context(self._fetch_with_retries), video_id)
+                self._in_flight[video_id] = future
+                future.add_done_callback(lambda done: self._finish(video_id, done))
+            return future
+
+    def fetch(self, video_id):
+        """Fetches a single transcript."""
+        return self.submit(video_id).result()
+
+    def fetch_many(self, video_ids):
+        """Fetches several transcripts concurrently, returning {video_id: entries}."""
+        futures = {video_id: self.submit(video_id) for video_id in dict.fromkeys(video_ids)}
+        return {video_id: future.result() for video_id, future in futures.items()}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,148 @@
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+
+STORE_PATH = os.path.join("transcripts", "transcripts.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT PRIMARY KEY,
+    entry_count INTEGER NOT NULL,
+    starts BLOB NOT NULL,
+    durations BLOB NOT NULL,
+    text_ends BLOB NOT NULL,
+    text BLOB NOT NULL
+)
+"""
+
+def pack_transcript(transcript):
+    """Packs transcript entries into float64 start/duration arrays and one compressed text blob."""
+    starts = array("d", (float(entry["start"]) for entry in transcript))
+    durations = array("d", (float(entry.get("duration", 0)) for entry in transcript))
+    encoded = [entry["text"].encode("utf-8") for entry in transcript]
+    text_ends = array("Q")
+    end = 0
+    for text in encoded:
+        end += len(text)
+        text_ends.append(end)
+    return starts, durations, text_ends, b"".join(encoded)
+
+class StoredTranscript:
+    """A transcript held as packed arrays, sliced into entries only on demand."""
+
+    def __init__(self, video_id, starts, durations, text_ends, text):
+        self.video_id = video_id
+        self.starts = starts
+        self.durations = durations
+        self.text_ends = text_ends
+        self.text = text
+
+    def __len__(self):
+        return len(self.starts)
+
+    def entry_text(self, index):
+        begin = self.text_ends[index - 1] if index else 0
+        return self.text[begin:self.text_ends[index]].decode("utf-8")
+
+    def entries(self, first=0, last=None):
+        """Returns entries [first, last) as the {text, start, duration} dicts the API returns."""
+        last = len(self) if last is None else last
+        return [
+            {"text": self.entry_text(i), "start": self.starts[i], "duration": self.durations[i]}
+            for i in range(first, last)
+        ]
+
+    def time_range(self, start_seconds, end_seconds):
+        """Returns the entries that start within [start_seconds, end_seconds)."""
+        return self.entries(bisect_left(self.starts, start_seconds), bisect_left(self.starts, end_seconds))
+
+class TranscriptStore:
+    """Indexed single-file store for transcripts, keyed by video ID."""
+
+    def __init__(self, path=STORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(SCHEMA)
+
+    def __contains__(self, video_id):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM transcripts WHERE video_id = ?", (video_id,)).fetchone() is not None
+
+    def video_ids(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT video_id FROM transcripts ORDER BY video_id")]
+
+    def put(self, video_id, transcript):
+        """Stores (or replaces) a transcript given as a list of API entries."""
+        self.put_many({video_id: transcript})
+
+    def put_many(self, transcripts):
+        """Stores several transcripts in a single transaction."""
+        rows = []
+        for video_id, transcript in transcripts.items():
+            starts, durations, text_ends, text = pack_transcript(transcript)
+            rows.append((video_id, len(starts), starts.tobytes(), durations.tobytes(), text_ends.tobytes(), zlib.compress(text)))
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def _unpack(self, row):
+        video_id, _, starts, durations, text_ends, text = row
+        return StoredTranscript(
+            video_id, array("d", starts), array("d", durations), array("Q", text_ends), zlib.decompress(text)
+        )
+
+    def load(self, video_id):
+        """Returns the StoredTranscript for a video, or None if it is not stored."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM transcripts WHERE video_id = ?", (video_id,)).fetchone()
+        return self._unpack(row) if row else None
+
+    def load_many(self, video_ids=None):
+        """Returns {video_id: StoredTranscript} for the given videos, or for every stored video."""
+        with self._lock:
+            if video_ids is None:
+                rows = self._db.execute("SELECT * FROM transcripts").fetchall()
+            else:
+                video_ids = list(video_ids)
+                placeholders = ",".join("?" * len(video_ids))
+                rows = self._db.execute(f"SELECT * FROM transcripts WHERE video_id IN ({placeholders})", video_ids).fetchall()
+        return {row[0]: self._unpack(row) for row in rows}
+
+    def get(self, video_id):
+        """Returns a video's transcript as API entries, or None if it is not stored."""
+        transcript = self.load(video_id)
+        return transcript.entries() if transcript else None
+
+    def get_range(self, video_id, start_seconds, end_seconds):
+        """Returns the entries of a video that start within [start_seconds, end_seconds)."""
+        transcript = self.load(video_id)
+        return transcript.time_range(start_seconds, end_seconds) if transcript else []
+
+    def import_json_folder(self, folder="transcripts"):
+        """Imports every `<video_id>.json` transcript in a folder, skipping sponsorship results."""
+        transcripts = {}
+        for path in glob.glob(os.path.join(folder, "*.json")):
+            video_id = os.path.splitext(os.path.basename(path))[0]
+            if video_id.endswith("_sponsorship"):
+                continue
+            with open(path, "r", encoding="utf-8") as file:
+                transcripts[video_id] = json.load(file)
+        self.put_many(transcripts)
+        return len(transcripts)
+
+    def close(self):
+        self._db.close()
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else "transcripts"
+    store = TranscriptStore()
+    print(f"Imported {store.import_json_folder(folder)} transcripts into {store.path}")
+    store.close()
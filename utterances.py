@@ -0,0 +1,47 @@
+import os
+
+# A silence at least this long between two caption entries ends an utterance
+UTTERANCE_PAUSE_SECONDS = float(os.getenv("UTTERANCE_PAUSE_SECONDS", "0.6"))
+
+# Utterances are also cut once they reach either limit. Auto-generated captions
+# overlap almost everywhere, so on them these limits do most of the splitting.
+MAX_UTTERANCE_SECONDS = float(os.getenv("UTTERANCE_MAX_SECONDS", "12"))
+MAX_UTTERANCE_WORDS = int(os.getenv("UTTERANCE_MAX_WORDS", "40"))
+
+def segment_utterances(transcript, pause_seconds=UTTERANCE_PAUSE_SECONDS,
+                       max_seconds=MAX_UTTERANCE_SECONDS, max_words=MAX_UTTERANCE_WORDS):
+    """Groups consecutive transcript entries into utterances using their timing alone.
+
+    An utterance ends where an entry starts at least pause_seconds after the
+    previous entry ended (start - (previous start + duration)), or before it
+    would grow past max_seconds or max_words. Returns {"start", "end", "text"}
+    dicts in transcript order; entries are never split.
+    """
+    utterances = []
+    current, words = None, 0
+    previous_end = None
+    for entry in transcript:
+        text = entry["text"].strip()
+        if not text:
+            continue
+        start = float(entry["start"])
+        end = start + max(float(entry.get("duration", 0)), 0.0)
+        entry_words = len(text.split())
+        if current is None or (
+            start - previous_end >= pause_seconds
+            or end - current["start"] > max_seconds
+            or words + entry_words > max_words
+        ):
+            current = {"start": start, "end": end, "texts": []}
+            utterances.append(current)
+            words = 0
+        current["texts"].append(text)
+        current["end"] = max(current["end"], end)
+        words += entry_words
+        previous_end = end
+    return [{"start": u["start"], "end": u["end"], "text": " ".join(u["texts"])} for u in utterances]
+
+def split_words(text, max_words=MAX_UTTERANCE_WORDS):
+    """Fallback segmentation for text without timestamps: consecutive runs of max_words words."""
+    words = text.split()
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]